@@ -0,0 +1,38 @@
+import numpy as np
+
+EARTH_RADIUS_MILES = 3959
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    """Distance in miles between lat/lon points; accepts scalars or arrays"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def radius_bbox(center, radius_miles):
+    """(minlon, minlat, maxlon, maxlat) that contains every point within the radius"""
+    lat0, lon0 = center
+    dlat = np.degrees(radius_miles / EARTH_RADIUS_MILES)
+    # Longitude degrees shrink towards the poles; use the widest latitude
+    cos_lat = np.cos(np.radians(min(abs(lat0) + dlat, 89.9)))
+    dlon = np.degrees(radius_miles / (EARTH_RADIUS_MILES * cos_lat))
+    return lon0 - dlon, lat0 - dlat, lon0 + dlon, lat0 + dlat
+
+
+def within_radius(lats, lons, center, radius_miles):
+    """
+    Boolean mask of the points within radius_miles of center ([lat, lon]).
+    A cheap bbox test discards far points before the exact haversine check.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    min_lon, min_lat, max_lon, max_lat = radius_bbox(center, radius_miles)
+
+    mask = (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+    candidates = np.flatnonzero(mask)
+    distances = haversine_miles(center[0], center[1], lats[candidates], lons[candidates])
+    mask[candidates[distances > radius_miles]] = False
+    return mask
@@ -0,0 +1,82 @@
+import numpy as np
+
+# Zoom levels with precomputed bins; requests outside are clamped
+MIN_ZOOM = 10
+MAX_ZOOM = 18
+# Bins across one 256px map tile, i.e. one bin per 4 screen pixels
+CELLS_PER_TILE = 64
+HOURS_PER_WEEK = 7 * 24
+
+
+def clamp_zoom(zoom):
+    return min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+
+
+def cell_size_for_zoom(zoom):
+    """Bin width in degrees at a zoom level"""
+    return 360.0 / (2 ** zoom * CELLS_PER_TILE)
+
+
+def hour_of_week(times):
+    """Hour of the week (0 = Monday 00:00) of datetime64 values"""
+    hours = times.astype("datetime64[h]").astype(np.int64)
+    # 1970-01-01 was a Thursday, i.e. 3 days after a Monday
+    return (hours + 3 * 24) % HOURS_PER_WEEK
+
+
+def bin_points(lats, lons, zoom):
+    """
+    Count points per square bin at a zoom level.
+    Returns (center_lats, center_lons, counts) for the non-empty bins only,
+    so memory stays proportional to the data even at street-level zooms.
+    """
+    size = cell_size_for_zoom(zoom)
+    cols = np.floor(np.asarray(lons) / size).astype(np.int64)
+    rows = np.floor(np.asarray(lats) / size).astype(np.int64)
+
+    keys = (cols << 32) | (rows & 0xFFFFFFFF)
+    keys, counts = np.unique(keys, return_counts=True)
+
+    cols = keys >> 32
+    rows = (keys & 0xFFFFFFFF).astype(np.int32).astype(np.int64)
+    return (rows + 0.5) * size, (cols + 0.5) * size, counts
+
+
+class HeatmapBins:
+    """
+    Ticket counts per bin for every zoom in [MIN_ZOOM, MAX_ZOOM], binned
+    once from a TicketIndex. Filtered views (violation type, hour of week)
+    are binned on demand from the matching rows.
+    """
+
+    def __init__(self, ticket_index):
+        self.tickets = ticket_index
+        self.hours = hour_of_week(ticket_index.times)
+        self.levels = {
+            zoom: bin_points(ticket_index.lats, ticket_index.lons, zoom)
+            for zoom in range(MIN_ZOOM, MAX_ZOOM + 1)
+        }
+
+    def cells(self, zoom, bbox, violations=None, hours=None):
+        """[lat, lon, count] of the non-empty bins whose center is inside bbox"""
+        zoom = clamp_zoom(zoom)
+        min_lon, min_lat, max_lon, max_lat = bbox
+
+        if violations is None and hours is None:
+            lats, lons, counts = self.levels[zoom]
+        else:
+            # Widen by one bin so bins on the bbox edge count all their
+            # points, like the precomputed levels do
+            size = cell_size_for_zoom(zoom)
+            around = (min_lon - size, min_lat - size, max_lon + size, max_lat + size)
+            rows = self.tickets.query(bbox=around, violations=violations)
+            if hours is not None:
+                rows = rows[np.isin(self.hours[rows], hours)]
+            lats, lons, counts = bin_points(self.tickets.lats[rows], self.tickets.lons[rows], zoom)
+
+        inside = (lons >= min_lon) & (lons <= max_lon) & (lats >= min_lat) & (lats <= max_lat)
+        return [
+            list(cell) for cell in
+            zip(np.round(lats[inside], 6).tolist(), np.round(lons[inside], 6).tolist(),
+                counts[inside].tolist())
+        ]
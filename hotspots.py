@@ -0,0 +1,381 @@
+import os
+import sys
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import DBSCAN
+
+EARTH_RADIUS_METERS = 6371000
+# Roughly the 0.0002 degree neighbourhood the map scripts used to cluster with
+DEFAULT_EPS_METERS = 20
+# Above this many citations, cluster pre-aggregated grid cells instead of points
+GRID_THRESHOLD = 200000
+# Fixed projection origin for persisted state, so cells line up across runs
+SF_ORIGIN = (37.7749, -122.4194)
+# Bump whenever the saved HotspotState layout changes
+STATE_VERSION = 3
+# Columns HotspotState.update() reads
+HOTSPOT_COLUMNS = ["citation_number", "latitude", "longitude"]
+
+
+def project_to_meters(lats, lons, origin=None):
+    """
+    Equirectangular projection to meters around origin ([lat, lon], default
+    the mean of the points). Accurate to well under a meter across a city.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if origin is None:
+        origin = (lats.mean(), lons.mean()) if len(lats) else (0.0, 0.0)
+
+    lat0, lon0 = np.radians(origin[0]), np.radians(origin[1])
+    x = (np.radians(lons) - lon0) * np.cos(lat0) * EARTH_RADIUS_METERS
+    y = (np.radians(lats) - lat0) * EARTH_RADIUS_METERS
+    return np.column_stack([x, y])
+
+
+def pack_cells(cols, rows):
+    """Pack (column, row) cell indices into one int64 key each"""
+    return (cols << 32) | (rows & 0xFFFFFFFF)
+
+
+def unpack_cells(keys):
+    """(columns, rows) of packed cell keys"""
+    return keys >> 32, (keys & 0xFFFFFFFF).astype(np.int32).astype(np.int64)
+
+
+def cell_keys(xy, cell_size):
+    """Pack the (column, row) cell of every projected point into one int64"""
+    cells = np.floor(xy / cell_size).astype(np.int64)
+    return pack_cells(cells[:, 0], cells[:, 1])
+
+
+def cell_centers(keys, cell_size):
+    """Projected centers of packed cell keys"""
+    cols, rows = unpack_cells(keys)
+    return (np.column_stack([cols, rows]) + 0.5) * cell_size
+
+
+class HotspotState:
+    """
+    Hotspot clustering that persists between runs and is updated
+    incrementally.
+
+    Citations are aggregated into eps/2 cells (fixed projection, so cells
+    line up across runs) with a citation count per cell. The state also
+    remembers where every citation_number it has binned lies, so update()
+    only touches the citations that were added, dropped or moved since the
+    last run.
+
+    Up to grid_threshold citations, DBSCAN runs on the citations themselves
+    with exact metric distances. Larger states cluster the weighted cells
+    instead (neighbours within eps of cell centers, so within about
+    0.7 * eps of the true distance), and only the clusters near the cells
+    an update changed are reclustered.
+    """
+
+    def __init__(self, eps_meters=DEFAULT_EPS_METERS, min_samples=10, grid_threshold=GRID_THRESHOLD):
+        self.eps_meters = eps_meters
+        self.min_samples = min_samples
+        self.grid_threshold = grid_threshold
+        self.cell_size = eps_meters / 2
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.labels = np.empty(0, dtype=np.int64)
+        # Sorted citation numbers with the projected point and cell key of
+        # each, and their cluster labels while clustering by points
+        self.citations = np.empty(0, dtype=str)
+        self.citation_xy = np.empty((0, 2), dtype=np.float64)
+        self.citation_keys = np.empty(0, dtype=np.int64)
+        self.citation_labels = np.empty(0, dtype=np.int64)
+
+    @property
+    def by_points(self):
+        """Whether the state is small enough to cluster the citations themselves"""
+        return len(self.citations) <= self.grid_threshold
+
+    @classmethod
+    def load(cls, path, eps_meters=DEFAULT_EPS_METERS, min_samples=10, grid_threshold=GRID_THRESHOLD):
+        """
+        Saved state from path, or an empty state when there is none, it is
+        unreadable, or it was built with other parameters (all of which need
+        a full rebuild).
+        """
+        state = cls(eps_meters, min_samples, grid_threshold)
+        if not os.path.exists(path):
+            return state
+
+        try:
+            with np.load(path, allow_pickle=False) as saved:
+                if (int(saved["version"]) != STATE_VERSION or float(saved["eps_meters"]) != eps_meters
+                        or int(saved["min_samples"]) != min_samples
+                        or int(saved["grid_threshold"]) != grid_threshold):
+                    print(f"Hotspot state in {path} is outdated; rebuilding")
+                    return state
+
+                keys = saved["keys"]
+                counts = saved["counts"]
+                labels = saved["labels"]
+                citations = saved["citations"]
+                citation_xy = saved["citation_xy"]
+                citation_keys = saved["citation_keys"]
+                citation_labels = saved["citation_labels"]
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+            print(f"Hotspot state in {path} is unreadable ({e}); rebuilding")
+            return state
+
+        state.keys = keys
+        state.counts = counts
+        state.labels = labels
+        state.citations = citations
+        state.citation_xy = citation_xy
+        state.citation_keys = citation_keys
+        state.citation_labels = citation_labels
+        return state
+
+    def save(self, path):
+        # A unique temp file per writer, so concurrent saves never mix
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path) or ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    version=STATE_VERSION,
+                    eps_meters=self.eps_meters,
+                    min_samples=self.min_samples,
+                    grid_threshold=self.grid_threshold,
+                    keys=self.keys,
+                    counts=self.counts,
+                    labels=self.labels,
+                    citations=self.citations,
+                    citation_xy=self.citation_xy,
+                    citation_keys=self.citation_keys,
+                    citation_labels=self.citation_labels,
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def update(self, df):
+        """
+        Bring the state in line with df, the full current citation table
+        (citation_number, latitude, longitude), and recluster. Only
+        citations that are new, gone or moved change the state. Returns (added, removed) citation counts; a moved
+        citation counts as both.
+        """
+        df = df[df["latitude"].notna() & df["longitude"].notna()]
+        df = df.drop_duplicates("citation_number", keep="last")
+        citations = df["citation_number"].astype(str).to_numpy(dtype=str)
+        xy = project_to_meters(df["latitude"].values, df["longitude"].values, origin=SF_ORIGIN)
+        keys = cell_keys(xy, self.cell_size)
+        order = np.argsort(citations, kind="stable")
+        citations, xy, keys = citations[order], xy[order], keys[order]
+
+        # Citations already binned at the same point are left alone
+        kept = np.zeros(len(self.citations), dtype=bool)
+        unchanged = np.zeros(len(citations), dtype=bool)
+        if len(self.citations):
+            pos = np.minimum(np.searchsorted(self.citations, citations), len(self.citations) - 1)
+            unchanged = (self.citations[pos] == citations) & (self.citation_xy[pos] == xy).all(axis=1)
+            kept[pos[unchanged]] = True
+
+        added_keys = keys[~unchanged]
+        removed_keys = self.citation_keys[~kept]
+        was_by_points = self.by_points
+        self.citations = citations
+        self.citation_xy = xy
+        self.citation_keys = keys
+        if len(added_keys) == 0 and len(removed_keys) == 0:
+            return 0, 0
+
+        # Apply the count changes to the existing cells, dropping emptied ones
+        changed = np.concatenate([added_keys, removed_keys])
+        delta = np.concatenate([np.ones(len(added_keys), dtype=np.int64),
+                                -np.ones(len(removed_keys), dtype=np.int64)])
+        all_keys, inverse = np.unique(np.concatenate([self.keys, changed]), return_inverse=True)
+        inverse = inverse.ravel()
+        counts = np.zeros(len(all_keys), dtype=np.int64)
+        counts[inverse[:len(self.keys)]] = self.counts
+        np.add.at(counts, inverse[len(self.keys):], delta)
+
+        occupied = counts > 0
+        labels = np.full(len(all_keys), -1, dtype=np.int64)
+        labels[inverse[:len(self.keys)]] = self.labels
+        self.keys = all_keys[occupied]
+        self.counts = counts[occupied]
+        self.labels = labels[occupied]
+        if self.by_points:
+            self.cluster_points()
+        else:
+            # Cells have no labels yet when the state just outgrew points
+            self.recluster(changed=None if was_by_points else np.unique(changed))
+        return len(added_keys), len(removed_keys)
+
+    def cluster_points(self):
+        """DBSCAN over the citations themselves; cells are left unlabeled"""
+        self.labels = np.full(len(self.keys), -1, dtype=np.int64)
+        if len(self.citation_xy) == 0:
+            self.citation_labels = np.empty(0, dtype=np.int64)
+            return
+        dbscan = DBSCAN(eps=self.eps_meters, min_samples=self.min_samples, algorithm="kd_tree")
+        self.citation_labels = dbscan.fit(self.citation_xy).labels_
+
+    def near(self, keys):
+        """
+        Sorted indices of the existing cells within two cells of any of
+        `keys`. Cells are eps/2 wide, so this covers every cell within eps.
+        """
+        if len(self.keys) == 0 or len(keys) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        cols, rows = unpack_cells(np.asarray(keys, dtype=np.int64))
+        steps = np.arange(-2, 3)
+        around = pack_cells((cols[:, None] + np.repeat(steps, 5)).ravel(),
+                            (rows[:, None] + np.tile(steps, 5)).ravel())
+        pos = np.minimum(np.searchsorted(self.keys, around), len(self.keys) - 1)
+        found = np.zeros(len(self.keys), dtype=bool)
+        found[pos[self.keys[pos] == around]] = True
+        return np.flatnonzero(found)
+
+    def in_clusters(self, cells):
+        """Indices of every cell in a cluster that one of `cells` belongs to"""
+        clusters = np.unique(self.labels[cells])
+        return np.flatnonzero(np.isin(self.labels, clusters[clusters >= 0]))
+
+    def recluster(self, changed=None):
+        """
+        Recluster after the counts of the `changed` cell keys changed, or
+        every cell when changed is None.
+
+        A count change can only flip the core status of cells within eps,
+        which in turn can only merge, split or re-border the clusters next
+        to them. Those clusters and cells (the region) are refit, together
+        with the clusters bordering the region and the cells around them so
+        every refit cell sees its full neighbourhood; labels elsewhere stay
+        as they are. Cells only brought in as context keep their old labels,
+        and clusters formed in the region get fresh ids. When the refit
+        would cover most cells anyway, everything is refit in one pass.
+        """
+        self.citation_labels = np.empty(0, dtype=np.int64)
+        if len(self.keys) == 0:
+            self.labels = np.empty(0, dtype=np.int64)
+            return
+
+        dbscan = DBSCAN(eps=self.eps_meters, min_samples=self.min_samples, algorithm="kd_tree")
+        # Each changed cell reaches 25 cells, so with this many changes the
+        # neighbourhood is most of the state and one full pass is cheaper
+        if changed is None or len(changed) * 25 > len(self.keys):
+            centers = cell_centers(self.keys, self.cell_size)
+            self.labels = dbscan.fit(centers, sample_weight=self.counts).labels_
+            return
+
+        flipped = self.near(changed)
+        touched = self.near(self.keys[flipped])
+        region = np.union1d(touched, self.in_clusters(touched))
+        context = np.union1d(region, self.in_clusters(self.near(self.keys[region])))
+        fit = np.union1d(context, self.near(self.keys[context]))
+        if len(fit) > len(self.keys) // 2:
+            self.recluster()
+            return
+
+        model = dbscan.fit(cell_centers(self.keys[fit], self.cell_size), sample_weight=self.counts[fit])
+        local = model.labels_
+
+        # Clusters that reach cores of the unchanged context keep their id
+        in_region = np.isin(fit, region)
+        is_core = np.zeros(len(fit), dtype=bool)
+        is_core[model.core_sample_indices_] = True
+        kept = is_core & ~in_region & np.isin(fit, context) & (local >= 0)
+        clusters = np.unique(local[local >= 0])
+        ids = np.full(len(clusters), -1, dtype=np.int64)
+        ids[np.searchsorted(clusters, local[kept])] = self.labels[fit[kept]]
+        fresh = ids < 0
+        ids[fresh] = self.labels.max() + 1 + np.arange(fresh.sum())
+        labels = np.full(len(fit), -1, dtype=np.int64)
+        clustered = local >= 0
+        labels[clustered] = ids[np.searchsorted(clusters, local[clustered])]
+        self.labels[fit[in_region]] = labels[in_region]
+
+    def labels_for(self, lats, lons):
+        """
+        Cluster label of each point (-1 if noise or unknown): the label of
+        the citations at that exact spot when clustering by points,
+        otherwise the label of the cell it falls in.
+        """
+        xy = project_to_meters(lats, lons, origin=SF_ORIGIN)
+        if self.by_points:
+            # Citations at the same spot always share a label
+            known = pd.DataFrame({"x": self.citation_xy[:, 0], "y": self.citation_xy[:, 1],
+                                  "label": self.citation_labels}).drop_duplicates(["x", "y"])
+            pos = pd.MultiIndex.from_frame(known[["x", "y"]]).get_indexer(
+                pd.MultiIndex.from_arrays([xy[:, 0], xy[:, 1]]))
+            labels = np.full(len(xy), -1, dtype=np.int64)
+            labels[pos >= 0] = known["label"].to_numpy()[pos[pos >= 0]]
+            return labels
+
+        keys = cell_keys(xy, self.cell_size)
+        if len(self.keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+
+        pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[pos] == keys, self.labels[pos], -1)
+
+
+def summarize_clusters(labels, lats, lons, violation_codes, violation_names, hours=None, top_n=3):
+    """
+    One summary per cluster (largest first) from a single grouped pass over
+    the rows: center, citation count, the top_n violation types and, when
+    hours (0-23, negative = unknown) are given, a 24-bin hour-of-day
+    histogram.
+    """
+    labels = np.asarray(labels)
+    clustered = labels >= 0
+    clusters, inverse = np.unique(labels[clustered], return_inverse=True)
+    inverse = inverse.ravel()
+    k = len(clusters)
+    if k == 0:
+        return []
+
+    counts = np.bincount(inverse, minlength=k)
+    center_lats = np.bincount(inverse, weights=np.asarray(lats, dtype=np.float64)[clustered], minlength=k) / counts
+    center_lons = np.bincount(inverse, weights=np.asarray(lons, dtype=np.float64)[clustered], minlength=k) / counts
+
+    n_types = len(violation_names)
+    codes = np.asarray(violation_codes)[clustered]
+    by_type = np.bincount(inverse * n_types + codes, minlength=k * n_types).reshape(k, n_types)
+    top = np.argsort(-by_type, axis=1, kind="stable")[:, :top_n]
+
+    if hours is not None:
+        hours = np.asarray(hours)[clustered]
+        known = hours >= 0
+        by_hour = np.bincount(inverse[known] * 24 + hours[known].astype(np.int64),
+                              minlength=k * 24).reshape(k, 24)
+
+    summaries = []
+    for c in np.argsort(-counts, kind="stable"):
+        summary = {
+            "cluster": int(clusters[c]),
+            "count": int(counts[c]),
+            "latitude": round(float(center_lats[c]), 6),
+            "longitude": round(float(center_lons[c]), 6),
+            "top_violations": [[violation_names[t], int(by_type[c, t])] for t in top[c] if by_type[c, t] > 0],
+        }
+        if hours is not None:
+            summary["hours"] = by_hour[c].tolist()
+        summaries.append(summary)
+    return summaries
+
+
+if __name__ == "__main__":
+    # Build step: python hotspots.py [data/tickets_with_coords.parquet [data/hotspot_state.npz]]
+    tickets_path = sys.argv[1] if len(sys.argv) > 1 else "data/tickets_with_coords.parquet"
+    state_path = sys.argv[2] if len(sys.argv) > 2 else "data/hotspot_state.npz"
+    state = HotspotState.load(state_path)
+    added, removed = state.update(pd.read_parquet(tickets_path, columns=HOTSPOT_COLUMNS))
+    state.save(state_path)
+    labels = state.citation_labels if state.by_points else state.labels
+    print(f"Hotspot state: {added} added, {removed} removed tickets, {len(state.keys)} cells, "
+          f"{len(np.unique(labels[labels >= 0]))} clusters in {state_path}")
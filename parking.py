@@ -1,15 +1,195 @@
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, send_from_directory, jsonify, request
 from flask_cors import CORS
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import hashlib
+import math
+import numpy as np
+import os
 import requests
-import random
-import json
+
+from heatmap import HeatmapBins, cell_size_for_zoom, clamp_zoom
+from hotspots import HotspotState, summarize_clusters
+from parking_rules import CompiledRules, RuleTimeline, change_minutes, hours_value, steady_interval
+from regulations import RegulationTable
+from response_cache import ResponseCache
+from simplify import tolerance_for_zoom
+from spatial_index import GridIndex
+from street_store import CACHE_VERSION, load_streets, source_key
+from ticket_index import TicketIndex
+from tiles import MAX_ZOOM, TileCache, coordinate_decimals, tile_bounds, valid_tile
 
 app = Flask(__name__, static_folder="frontend/my-app/build", static_url_path="")
 CORS(app, origins=["http://localhost:3000"])
 
-with open("data/sf_streets.json", "r") as f:
-    street_data = json.load(f)
-    centerlines = street_data["features"]
+# Load the street centerlines once into a compact columnar store (memory-mapped
+# from data/sf_streets.cache when it is up to date) and index the segment
+# centroids so /zones only has to look at the segments near the requested
+# viewport
+streets = load_streets("data/sf_streets.json")
+zone_index = GridIndex(streets.centroids[:, 0], streets.centroids[:, 1])
+
+# Bind a regulation to every segment once, so identical /zones requests
+# always return identical payloads
+regulations = RegulationTable.build(streets)
+
+# Identifies the data behind /zones; part of every ETag
+DATA_VERSION = f"{CACHE_VERSION}:{source_key('data/sf_streets.json')}:{regulations.version}"
+ZONES_CACHE_CONTROL = "public, max-age=300"
+
+# Serialized + gzipped /zones payloads keyed on bbox
+zones_cache = ResponseCache(max_entries=256)
+
+# Gzipped tiles are written to disk after first generation; the directory is
+# keyed on DATA_VERSION so tiles from older data are never served
+tile_cache = TileCache("data/tile_cache", DATA_VERSION)
+TILES_CACHE_CONTROL = "public, max-age=86400"
+
+# Largest extent of any segment: widening a centroid query by this finds
+# every segment whose bbox touches a tile
+extents = streets.bboxes[:, 2:] - streets.bboxes[:, :2]
+SEGMENT_MARGIN = float(extents.max()) if len(extents) else 0.0
+
+# Regulations compiled once per distinct rule; a segment's status is the
+# status of its rule (regulations.codes)
+compiled_rules = CompiledRules.from_properties(regulations.rules)
+rule_timelines = RuleTimeline.build_all(compiled_rules)
+segment_lookup = {segment_id: i for i, segment_id in enumerate(regulations.ids)}
+
+# Every segment keeps its status between consecutive changes of any rule
+# timeline, so /status answers are computed once per such interval
+# (evaluated at its start) and cached
+status_changes = change_minutes(rule_timelines)
+SF_TIMEZONE = ZoneInfo("America/Los_Angeles")
+status_cache = ResponseCache(max_entries=512)
+
+# Real geocoded citations (scripts/clean_csv.py output), indexed once
+TICKETS_PATH = "data/tickets_with_coords.parquet"
+if os.path.exists(TICKETS_PATH):
+    ticket_index = TicketIndex.from_parquet(TICKETS_PATH)
+    heatmap_bins = HeatmapBins(ticket_index)
+    print(f"Loaded {len(ticket_index)} citations from {TICKETS_PATH}")
+else:
+    ticket_index = None
+    heatmap_bins = None
+    print(f"{TICKETS_PATH} not found; /tickets and /heatmap are unavailable")
+TICKETS_VERSION = source_key(TICKETS_PATH) if ticket_index is not None else None
+MAX_TICKETS = 5000
+heatmap_cache = ResponseCache(max_entries=256)
+
+# Violation hotspots: cluster labels come from the hotspot state the pipeline
+# maintains (python hotspots.py, or the map scripts). The server only reads
+# it, labels the indexed citations in memory and summarizes every cluster
+# once at startup
+HOTSPOT_STATE_PATH = "data/hotspot_state.npz"
+HOTSPOT_TOP_VIOLATIONS = 5
+# Identifies the state the summaries come from; part of the /hotspots ETag
+# (taken before loading, so a state written meanwhile gets a new tag)
+HOTSPOTS_VERSION = source_key(HOTSPOT_STATE_PATH) if os.path.exists(HOTSPOT_STATE_PATH) else None
+if ticket_index is not None:
+    hotspot_state = HotspotState.load(HOTSPOT_STATE_PATH, eps_meters=20, min_samples=10)
+    if len(hotspot_state.keys) == 0:
+        print(f"No hotspot state in {HOTSPOT_STATE_PATH}; run python hotspots.py to build it")
+    hotspot_summaries = summarize_clusters(
+        hotspot_state.labels_for(ticket_index.lats, ticket_index.lons),
+        ticket_index.lats, ticket_index.lons,
+        ticket_index.violation_codes, ticket_index.violation_names,
+        hours=ticket_index.times.astype("datetime64[h]").astype(np.int64) % 24,
+        top_n=HOTSPOT_TOP_VIOLATIONS,
+    )
+else:
+    hotspot_summaries = None
+hotspots_cache = ResponseCache(max_entries=64)
+
+# Default /zones viewport: the area around USFCA
+DEFAULT_BBOX = (-122.460, 37.774, -122.440, 37.785)
+
+
+def parse_bbox(value):
+    """Parse a "minlon,minlat,maxlon,maxlat" query parameter"""
+    if not value:
+        return DEFAULT_BBOX
+
+    parts = value.split(",")
+    if len(parts) != 4:
+        raise ValueError("bbox must be minlon,minlat,maxlon,maxlat")
+
+    min_lon, min_lat, max_lon, max_lat = (float(p) for p in parts)
+    if not all(math.isfinite(v) for v in (min_lon, min_lat, max_lon, max_lat)):
+        raise ValueError("bbox values must be finite numbers")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox min values must not exceed max values")
+
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def parse_level(args):
+    """
+    Geometry level for ?zoom=<int> or ?tolerance=<degrees>: the coarsest
+    precomputed simplification that is still fine enough, or None for full
+    geometry.
+    """
+    if args.get("zoom"):
+        zoom = int(args["zoom"])
+        if not 0 <= zoom <= MAX_ZOOM:
+            raise ValueError(f"zoom must be between 0 and {MAX_ZOOM}")
+        tolerance = tolerance_for_zoom(zoom)
+    elif args.get("tolerance"):
+        tolerance = float(args["tolerance"])
+    else:
+        return None
+
+    if not tolerance >= 0:
+        raise ValueError("tolerance must be a non-negative number")
+    return streets.level_for(tolerance)
+
+
+def parse_time(value):
+    """
+    Parse an ISO 8601 ?at= value into naive San Francisco local time (the
+    time regulations are written in). Defaults to now.
+    """
+    if not value:
+        return datetime.now(SF_TIMEZONE).replace(tzinfo=None)
+
+    at = datetime.fromisoformat(value)
+    if at.tzinfo is not None:
+        at = at.astimezone(SF_TIMEZONE).replace(tzinfo=None)
+    return at
+
+
+def zones_etag(bbox, level):
+    """Strong ETag for a /zones response, derived without building it"""
+    return hashlib.sha1(f"{DATA_VERSION}:{bbox}:{level}".encode()).hexdigest()
+
+
+def cacheable(response, etag, cache_control=ZONES_CACHE_CONTROL):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def cached_json(cache, key, etag, build, cache_control=ZONES_CACHE_CONTROL):
+    """
+    Serve a JSON payload from a ResponseCache, building it on a miss.
+    Clients that accept gzip get the pre-compressed bytes as-is; each
+    encoding has its own ETag and either one satisfies If-None-Match.
+    """
+    gzip_etag = f"{etag}-gzip"
+    use_gzip = "gzip" in request.accept_encodings
+    if request.if_none_match.contains(etag) or request.if_none_match.contains(gzip_etag):
+        response = app.response_class(status=304)
+    else:
+        entry = cache.get(key, build)
+        response = app.response_class(mimetype="application/json")
+        if use_gzip:
+            response.set_data(entry.gzipped)
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response.set_data(entry.body)
+
+    response.vary.add("Accept-Encoding")
+    return cacheable(response, gzip_etag if use_gzip else etag, cache_control)
 
 @app.route('/')
 def serve_react():
@@ -19,86 +199,299 @@ def serve_react():
 def not_found(e):
     return send_from_directory(app.static_folder, 'index.html')
 
+def build_zones(bbox, level=None):
+    """FeatureCollection of the segments whose centroid falls inside bbox"""
+    print(f"Generating parking zones in bbox {','.join(map(str, bbox))}...")
+
+    features = []
+    for i in zone_index.query(*bbox):
+        feat = {
+            "type": "Feature",
+            "id": regulations.ids[i],
+            "geometry": streets.geometry(i, level),
+            "properties": regulations.rule(i)
+        }
+        features.append(feat)
+
+    return {
+        "type": "FeatureCollection",
+        "features": features
+    }
+
+
 @app.route('/zones')
 def zones():
     """
-    Generate sample parking zone data around USFCA since the SF API is broken.
-    In production, this would use real API data.
+    Parking zone data for the street segments in a viewport.
+    Pass ?bbox=minlon,minlat,maxlon,maxlat to choose the area (defaults to USFCA)
+    and ?zoom=<map zoom> or ?tolerance=<degrees> to get simplified geometry.
+    Regulations come from data/regulations.csv when present, otherwise each
+    segment gets a fixed sample regulation.
+    Responses are cached pre-serialized (and gzipped) per bbox and carry an
+    ETag; a matching If-None-Match returns 304.
     """
-    print("Generating sample parking zones around USFCA...")
-    
-    # USFCA coordinates: 37.7765, -122.4505
-    # Generate sample street segments in a grid around USFCA
     try:
+        bbox = parse_bbox(request.args.get("bbox"))
+        level = parse_level(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        features = []
-        lat_min, lat_max = 37.774, 37.785
-        lon_min, lon_max = -122.460, -122.440
-        
-        # Sample regulations with different time limits
-        regulations = [
-            ("NO PARKING 8AM-6PM", 0),
-            ("2 HR PARKING 9AM-6PM", 2),
-            ("1 HR PARKING 9AM-6PM", 1),
-            ("4 HR PARKING 9AM-6PM", 4),
-            ("STREET CLEANING THU 12PM-2PM", 0),
-        ]
-        
-        # Generate streets in a grid around USFCA
-        
-        for feature in centerlines:
-            coords = feature["geometry"]["coordinates"]
-
-            lats = [c[1] for c in coords]
-            lons = [c[0] for c in coords]
-            centroid_lat = sum(lats) / len(lats) 
-            centroid_lon = sum(lons) / len(lons)
-
-            if (lat_min <= centroid_lat <= lat_max) and (lon_min <= centroid_lon <= lon_max):
-                regulation, hours = random.choice(regulations)
-                feat = {
-                    "type": "Feature",
-                    "geometry": feature["geometry"],
-                    "properties": {
-                        "regulation": regulation,
-                        "days": "MON_FRI",
-                        "hrs_begin": "900" if hours > 0 else "",
-                        "hrs_end": "1800" if hours > 0 else "",
-                        "max_hours": hours
-                    }
-                }
-                features.append(feat)
+    try:
+        return cached_json(zones_cache, (bbox, level), zones_etag(bbox, level),
+                           lambda: build_zones(bbox, level))
+    except Exception as e:
+        print("Error in /zones", e)
+        return jsonify({"error": str(e)}), 500
 
-        return jsonify({
-            "type": "FeatureCollection",
-            "features": features
+
+def build_tile(z, x, y):
+    """
+    GeoJSON tile of every segment touching tile z/x/y, using the precomputed
+    simplification for that zoom, with coordinates rounded to match.
+    """
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(z, x, y)
+    tolerance = tolerance_for_zoom(z)
+    decimals = coordinate_decimals(tolerance)
+    level = streets.level_for(tolerance)
+
+    m = SEGMENT_MARGIN
+    candidates = zone_index.query(min_lon - m, min_lat - m, max_lon + m, max_lat + m)
+    boxes = streets.bboxes[candidates]
+    touching = (
+        (boxes[:, 0] <= max_lon) & (boxes[:, 2] >= min_lon) &
+        (boxes[:, 1] <= max_lat) & (boxes[:, 3] >= min_lat)
+    )
+
+    features = []
+    for i in candidates[touching]:
+        coords = np.round(streets.coordinates(i, level), decimals)
+        features.append({
+            "type": "Feature",
+            "id": regulations.ids[i],
+            "geometry": {"type": "LineString", "coordinates": coords.tolist()},
+            "properties": regulations.rule(i)
+        })
+
+    return {
+        "type": "FeatureCollection",
+        "features": features
+    }
+
+
+@app.route('/tiles/<int:z>/<int:x>/<int:y>')
+def tiles(z, x, y):
+    """
+    GeoJSON tile of street segments and their regulations, so clients only
+    fetch what is visible. Geometry is simplified for the tile's zoom level.
+    """
+    if not valid_tile(z, x, y):
+        return jsonify({"error": f"invalid tile {z}/{x}/{y}"}), 400
+
+    etag = hashlib.sha1(f"{DATA_VERSION}:{z}/{x}/{y}".encode()).hexdigest()
+    try:
+        return cached_json(tile_cache, (z, x, y), etag, lambda: build_tile(z, x, y),
+                           cache_control=TILES_CACHE_CONTROL)
+    except Exception as e:
+        print("Error in /tiles", e)
+        return jsonify({"error": str(e)}), 500
+
+
+def build_status(start, end, bbox):
+    """Allowed/limit of every segment in bbox during the interval [start, end)"""
+    print(f"Evaluating parking status for {start.isoformat()}...")
+
+    allowed, limit = compiled_rules.evaluate(start)
+    segments = []
+    for i in zone_index.query(*bbox):
+        code = regulations.codes[i]
+        segments.append({
+            "id": regulations.ids[i],
+            "allowed": bool(allowed[code]),
+            "max_hours": hours_value(limit[code])
         })
+
+    return {
+        "at": start.isoformat(),
+        "valid_until": end.isoformat(),
+        "segments": segments
+    }
+
+
+@app.route('/status')
+def status():
+    """
+    Whether parking is allowed, and for how long, on every segment in a viewport.
+    Pass ?at=<ISO 8601 time> (defaults to now) and ?bbox=minlon,minlat,maxlon,maxlat.
+    Results are shared by every request until the next time any regulation
+    changes.
+    """
+    try:
+        at = parse_time(request.args.get("at"))
+        bbox = parse_bbox(request.args.get("bbox"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    start, end = steady_interval(status_changes, at)
+    if request.args.get("at"):
+        # An explicit time always has the same answer
+        cache_control = "public, max-age=86400"
+    else:
+        cache_control = f"public, max-age={max(int((end - at).total_seconds()), 0)}"
+
+    etag = hashlib.sha1(f"{DATA_VERSION}:{start.isoformat()}:{end.isoformat()}:{bbox}".encode()).hexdigest()
+    try:
+        return cached_json(status_cache, (start, end, bbox), etag, lambda: build_status(start, end, bbox),
+                           cache_control=cache_control)
     except Exception as e:
-        print("Error in /zones", e)
+        print("Error in /status", e)
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/segments/<segment_id>/timeline')
+def segment_timeline(segment_id):
+    """
+    Current status of one segment, when its regulation next changes and how
+    long a car parked now may stay. Pass ?at=<ISO 8601 time> (defaults to now).
+    """
+    if segment_id not in segment_lookup:
+        return jsonify({"error": f"unknown segment {segment_id}"}), 404
+    try:
+        at = parse_time(request.args.get("at"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    i = segment_lookup[segment_id]
+    timeline = rule_timelines[regulations.codes[i]]
+    is_allowed, hours = timeline.status(at)
+
+    next_change = timeline.next_change(at)
+    if next_change is not None:
+        change_time, change_allowed, change_hours = next_change
+        next_change = {
+            "at": change_time.isoformat(),
+            "allowed": change_allowed,
+            "max_hours": change_hours
+        }
+
+    return jsonify({
+        "id": segment_id,
+        "at": at.isoformat(),
+        "allowed": is_allowed,
+        "max_hours": hours,
+        "legal_minutes": timeline.legal_minutes(at),
+        "next_change": next_change,
+        "regulation": regulations.rule(i)
+    })
+
+
+def parse_optional_time(value):
+    return parse_time(value) if value else None
+
+
 @app.route('/tickets')
 def tickets():
     """
-    Generate sample parking ticket locations around USFCA.
-    In production, this would use real ticket data.
-    """
-    print("Generating sample parking tickets around USFCA...")
-    
-    # Generate random ticket locations around USFCA
-    points = []
-    lat_center = 37.7765
-    lon_center = -122.4505
-    
-    for _ in range(200):
-        # Random offset within ~0.5km
-        lat = lat_center + (random.random() - 0.5) * 0.01
-        lon = lon_center + (random.random() - 0.5) * 0.01
-        points.append([lat, lon])
-    
-    print(f"✓ Generated {len(points)} sample ticket locations")
-    return jsonify(points)
+    Parking ticket locations as [lat, lon] pairs, most recent last.
+    Optional filters: ?bbox=minlon,minlat,maxlon,maxlat, ?start= and ?end=
+    (ISO 8601, end exclusive), ?violation=STR CLEAN,RED ZONE. At most
+    ?limit= (default and cap 5000) of the most recent matches are returned.
+    """
+    if ticket_index is None:
+        return jsonify({"error": f"{TICKETS_PATH} not found"}), 503
+
+    try:
+        bbox = parse_bbox(request.args.get("bbox")) if request.args.get("bbox") else None
+        start = parse_optional_time(request.args.get("start"))
+        end = parse_optional_time(request.args.get("end"))
+        limit = min(int(request.args.get("limit", MAX_TICKETS)), MAX_TICKETS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    violations = request.args.get("violation")
+    if violations:
+        violations = [v.strip() for v in violations.split(",")]
+
+    rows = ticket_index.query(bbox=bbox, start=start, end=end, violations=violations)
+    rows = rows[max(len(rows) - limit, 0):]
+
+    points = np.column_stack([ticket_index.lats[rows], ticket_index.lons[rows]])
+    print(f"✓ Returning {len(points)} ticket locations")
+    return jsonify(points.tolist())
+
+@app.route('/heatmap')
+def heatmap():
+    """
+    Ticket density as pre-binned counts: [[lat, lon, count], ...] bin centers.
+    Pass ?bbox=minlon,minlat,maxlon,maxlat (defaults to USFCA), ?zoom= (10-18,
+    default 16), and optionally ?violation=STR CLEAN,RED ZONE and
+    ?hour_of_week=0-167 (comma list, Monday 00:00 = 0).
+    """
+    if heatmap_bins is None:
+        return jsonify({"error": f"{TICKETS_PATH} not found"}), 503
+
+    try:
+        bbox = parse_bbox(request.args.get("bbox"))
+        zoom = clamp_zoom(int(request.args.get("zoom", 16)))
+        hours = request.args.get("hour_of_week")
+        hours = tuple(int(h) for h in hours.split(",")) if hours else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    violations = request.args.get("violation")
+    violations = tuple(v.strip() for v in violations.split(",")) if violations else None
+
+    def build():
+        return {
+            "zoom": zoom,
+            "cell_size": cell_size_for_zoom(zoom),
+            "cells": heatmap_bins.cells(zoom, bbox, violations=violations, hours=hours)
+        }
+
+    key = (bbox, zoom, violations, hours)
+    etag = hashlib.sha1(f"{TICKETS_VERSION}:{key}".encode()).hexdigest()
+    try:
+        return cached_json(heatmap_cache, key, etag, build)
+    except Exception as e:
+        print("Error in /heatmap", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/hotspots')
+def hotspots():
+    """
+    Ticket hotspot clusters whose center is inside ?bbox= (defaults to
+    USFCA), largest first, with at least ?min_count= (default 15) tickets.
+    Each has its center, count, top violation types and a 24-bin
+    hour-of-day histogram.
+    """
+    if hotspot_summaries is None:
+        return jsonify({"error": f"{TICKETS_PATH} not found"}), 503
+
+    try:
+        bbox = parse_bbox(request.args.get("bbox"))
+        min_count = int(request.args.get("min_count", 15))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        min_lon, min_lat, max_lon, max_lat = bbox
+        return {
+            "hotspots": [
+                summary for summary in hotspot_summaries
+                if summary["count"] >= min_count
+                and min_lon <= summary["longitude"] <= max_lon
+                and min_lat <= summary["latitude"] <= max_lat
+            ]
+        }
+
+    key = (bbox, min_count)
+    etag = hashlib.sha1(f"{TICKETS_VERSION}:{HOTSPOTS_VERSION}:hotspots:{key}".encode()).hexdigest()
+    try:
+        return cached_json(hotspots_cache, key, etag, build)
+    except Exception as e:
+        print("Error in /hotspots", e)
+        return jsonify({"error": str(e)}), 500
+
 
 @app.route('/real-api-test')
 def real_api_test():
@@ -0,0 +1,322 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+DAY_NAMES = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']
+ALL_DAYS = 0b1111111
+WEEKDAYS = 0b0011111
+WEEKENDS = 0b1100000
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+# HHMM value of every minute of a day, as compared against hrs_begin/hrs_end
+DAY_HHMM = (np.arange(MINUTES_PER_DAY) // 60) * 100 + np.arange(MINUTES_PER_DAY) % 60
+
+
+def get_field(properties, name):
+    """Regulation field under its lowercase or uppercase (SFMTA) name"""
+    return properties.get(name) or properties.get(name.upper())
+
+
+def get_max_hours(properties):
+    """Helper function to determine parking hours"""
+    if 'max_hours' in properties and properties['max_hours'] is not None:
+        return properties['max_hours']
+
+    begin = get_field(properties, 'hrs_begin')
+    end = get_field(properties, 'hrs_end')
+
+    if begin and end:
+        try:
+            begin = int(begin)
+            end = int(end)
+            begin_hours = begin // 100 + (begin % 100) / 60
+            end_hours = end // 100 + (end % 100) / 60
+            duration = end_hours - begin_hours
+            if duration > 0:
+                return duration
+        except (ValueError, TypeError):
+            pass
+
+    rule = str(get_field(properties, 'regulation') or '').upper()
+
+    if any(x in rule for x in ['NO PARKING', 'TOW-AWAY', 'NO STOPPING']):
+        return 0
+    if '1 HR' in rule or '1HR' in rule or '1 HOUR' in rule:
+        return 1
+    if '2 HR' in rule or '2HR' in rule or '2 HOUR' in rule:
+        return 2
+    if '3 HR' in rule or '3HR' in rule or '3 HOUR' in rule:
+        return 3
+    if '4 HR' in rule or '4HR' in rule or '4 HOUR' in rule:
+        return 4
+
+    return None
+
+
+def is_parking_allowed_now(properties, check_time=None):
+    """
+    Check if parking is allowed at the given time for a single segment
+    Returns: (is_allowed: bool, hours_available: float or None)
+    """
+    if check_time is None:
+        check_time = datetime.now()
+
+    return CompiledRules.from_properties([properties]).statuses(check_time)[0]
+
+
+def parse_day_mask(days):
+    """Bitmask of the weekdays (bit 0 = Monday) a `days` field restricts"""
+    days = str(days or '').upper()
+    if not days:
+        return ALL_DAYS
+
+    # Handle common day formats (with or without hyphens/underscores)
+    days_normalized = days.replace('_', '-')
+    if 'MON-FRI' in days_normalized or 'WEEKDAYS' in days_normalized:
+        return WEEKDAYS
+    if 'SAT-SUN' in days_normalized or 'WEEKENDS' in days_normalized:
+        return WEEKENDS
+
+    mask = 0
+    for day, name in enumerate(DAY_NAMES):
+        if name in days:
+            mask |= 1 << day
+    return mask
+
+
+def parse_window(properties):
+    """(begin, end) restriction hours as HHMM ints, or None when absent/invalid"""
+    begin = get_field(properties, 'hrs_begin')
+    end = get_field(properties, 'hrs_end')
+    if begin and end:
+        try:
+            return int(begin), int(end)
+        except (ValueError, TypeError):
+            pass
+    return None
+
+
+def hours_value(hours):
+    """Turn a max-hours array value back into the int/float/None API form"""
+    if np.isnan(hours):
+        return None
+    return int(hours) if float(hours).is_integer() else float(hours)
+
+
+class CompiledRules:
+    """
+    Regulations of many segments compiled once into numeric arrays, so
+    "is parking allowed at time T, and for how long" is answered for every
+    segment in one NumPy pass instead of re-parsing strings per feature.
+
+    A segment's restriction is active on the days in its day mask, within
+    [begin, end] (HHMM, inclusive) when it has a time window. While active,
+    no-parking segments forbid parking and others allow it up to max_hours.
+    Outside the restriction parking is allowed without limit.
+    """
+
+    def __init__(self, day_masks, has_window, begin, end, max_hours, no_parking):
+        self.day_masks = day_masks
+        self.has_window = has_window
+        self.begin = begin
+        self.end = end
+        self.max_hours = max_hours
+        self.no_parking = no_parking
+
+    @classmethod
+    def from_properties(cls, properties_list):
+        n = len(properties_list)
+        day_masks = np.empty(n, dtype=np.uint8)
+        has_window = np.zeros(n, dtype=bool)
+        begin = np.zeros(n, dtype=np.int32)
+        end = np.zeros(n, dtype=np.int32)
+        max_hours = np.full(n, np.nan)
+        no_parking = np.zeros(n, dtype=bool)
+
+        for i, properties in enumerate(properties_list):
+            day_masks[i] = parse_day_mask(get_field(properties, 'days'))
+
+            window = parse_window(properties)
+            if window is not None:
+                has_window[i] = True
+                begin[i], end[i] = window
+
+            hours = get_max_hours(properties)
+            if hours is not None:
+                max_hours[i] = hours
+
+            regulation = str(get_field(properties, 'regulation') or '').upper()
+            no_parking[i] = 'NO PARKING' in regulation or 'TOW-AWAY' in regulation
+
+        return cls(day_masks, has_window, begin, end, max_hours, no_parking)
+
+    @classmethod
+    def from_features(cls, features):
+        return cls.from_properties([feature['properties'] for feature in features])
+
+    def __len__(self):
+        return len(self.day_masks)
+
+    def active(self, check_time):
+        """Whether each segment's restriction applies at check_time"""
+        day_ok = (self.day_masks >> check_time.weekday()) & 1 == 1
+        current_time_int = check_time.hour * 100 + check_time.minute
+        in_window = ~self.has_window | (
+            (current_time_int >= self.begin) & (current_time_int <= self.end)
+        )
+        return day_ok & in_window
+
+    def evaluate(self, check_time):
+        """
+        Returns (allowed, limit) arrays: allowed is a bool per segment, limit
+        the hours available (0 when not allowed, NaN when unrestricted).
+        """
+        active = self.active(check_time)
+        allowed = ~(active & self.no_parking)
+        limit = np.where(active, np.where(self.no_parking, 0.0, self.max_hours), np.nan)
+        return allowed, limit
+
+    def statuses(self, check_time):
+        """evaluate() as a list of (is_allowed, hours or None) tuples"""
+        allowed, limit = self.evaluate(check_time)
+        return [(bool(a), hours_value(h)) for a, h in zip(allowed, limit)]
+
+
+def minute_of_week(check_time):
+    return check_time.weekday() * MINUTES_PER_DAY + check_time.hour * 60 + check_time.minute
+
+
+class RuleTimeline:
+    """
+    Weekly timeline of one segment's regulation: the sorted minutes of the
+    week at which its restriction switches on or off. Answers "when does
+    this change next" and "how long can I stay" with a binary search
+    instead of probing the rule minute by minute.
+    """
+
+    def __init__(self, transitions, restricted_after, allowed_when_restricted,
+                 limit_when_restricted, always_restricted=False):
+        self.transitions = transitions
+        self.restricted_after = restricted_after
+        # State of a rule without transitions (restricted all week or never)
+        self.always_restricted = always_restricted
+        self.allowed_when_restricted = allowed_when_restricted
+        self.limit_when_restricted = limit_when_restricted
+        # Minutes at which parking stops being allowed
+        if allowed_when_restricted:
+            self.no_parking_starts = transitions[:0]
+        else:
+            self.no_parking_starts = transitions[restricted_after]
+
+    @classmethod
+    def from_rules(cls, rules, i):
+        """Timeline of segment i of a CompiledRules"""
+        if rules.has_window[i]:
+            day_active = (DAY_HHMM >= rules.begin[i]) & (DAY_HHMM <= rules.end[i])
+        else:
+            day_active = np.ones(MINUTES_PER_DAY, dtype=bool)
+        inactive = np.zeros(MINUTES_PER_DAY, dtype=bool)
+        week = np.concatenate([
+            day_active if (rules.day_masks[i] >> day) & 1 else inactive
+            for day in range(7)
+        ])
+
+        # A restriction that neither forbids parking nor limits it is the
+        # same as no restriction at all
+        no_parking = bool(rules.no_parking[i])
+        max_hours = rules.max_hours[i]
+        if not no_parking and np.isnan(max_hours):
+            week[:] = False
+
+        transitions = np.flatnonzero(week != np.roll(week, 1))
+        return cls(
+            transitions,
+            week[transitions],
+            not no_parking,
+            0.0 if no_parking else max_hours,
+            always_restricted=bool(week.all()),
+        )
+
+    @classmethod
+    def build_all(cls, rules):
+        return [cls.from_rules(rules, i) for i in range(len(rules))]
+
+    def state(self, restricted):
+        """(is_allowed, hours or None) for a restricted/unrestricted state"""
+        if not restricted:
+            return (True, None)
+        return (self.allowed_when_restricted, hours_value(self.limit_when_restricted))
+
+    def status(self, check_time):
+        """(is_allowed, hours or None) at check_time"""
+        if not len(self.transitions):
+            return self.state(self.always_restricted)
+        k = np.searchsorted(self.transitions, minute_of_week(check_time), side="right")
+        # Before the first transition of the week we are still in the state
+        # after the last one
+        return self.state(self.restricted_after[k - 1])
+
+    def minutes_until(self, starts, check_time):
+        """Minutes from check_time to the next minute in `starts` (wrapping weekly)"""
+        if not len(starts):
+            return None
+        minute = minute_of_week(check_time)
+        k = np.searchsorted(starts, minute, side="right")
+        if k == len(starts):
+            return int(starts[0] + MINUTES_PER_WEEK - minute)
+        return int(starts[k] - minute)
+
+    def next_change(self, check_time):
+        """
+        Returns (change_time, is_allowed, hours) for the next state change
+        after check_time, or None if the regulation never changes.
+        """
+        delta = self.minutes_until(self.transitions, check_time)
+        if delta is None:
+            return None
+        change_time = check_time.replace(second=0, microsecond=0) + timedelta(minutes=delta)
+        minute = minute_of_week(change_time)
+        k = np.searchsorted(self.transitions, minute, side="right")
+        return (change_time,) + self.state(self.restricted_after[k - 1])
+
+    def legal_minutes(self, check_time):
+        """
+        How long a car parked at check_time can stay: minutes until parking
+        becomes prohibited, capped by the current time limit. 0 when parking
+        is not allowed now, None when there is no limit at all.
+        """
+        is_allowed, hours = self.status(check_time)
+        if not is_allowed:
+            return 0
+
+        remaining = self.minutes_until(self.no_parking_starts, check_time)
+        if hours is not None:
+            limit = int(hours * 60)
+            remaining = limit if remaining is None else min(remaining, limit)
+        return remaining
+
+
+def change_minutes(timelines):
+    """Sorted minutes of the week at which any of the timelines changes state"""
+    return np.unique(np.concatenate([np.empty(0, dtype=np.int64)] + [t.transitions for t in timelines]))
+
+
+def steady_interval(changes, check_time):
+    """
+    (start, end) of the span between consecutive minutes in `changes`
+    (see change_minutes) that contains check_time. Every timeline keeps
+    the same state throughout it; without any changes the span is the
+    calendar week.
+    """
+    minute = minute_of_week(check_time)
+    now = check_time.replace(second=0, microsecond=0)
+    if not len(changes):
+        start = now - timedelta(minutes=minute)
+        return start, start + timedelta(minutes=MINUTES_PER_WEEK)
+
+    k = np.searchsorted(changes, minute, side="right")
+    # Before the first change of the week the span started last week
+    since = int(minute - changes[k - 1]) % MINUTES_PER_WEEK
+    until = int(changes[k % len(changes)] - minute) % MINUTES_PER_WEEK or MINUTES_PER_WEEK
+    return now - timedelta(minutes=since), now + timedelta(minutes=until)
@@ -0,0 +1,107 @@
+import csv
+import hashlib
+import json
+import os
+import zlib
+
+import numpy as np
+
+# Sample regulations with different time limits, used for segments that are
+# not covered by a real regulation table
+SAMPLE_REGULATIONS = [
+    ("NO PARKING 8AM-6PM", 0),
+    ("2 HR PARKING 9AM-6PM", 2),
+    ("1 HR PARKING 9AM-6PM", 1),
+    ("4 HR PARKING 9AM-6PM", 4),
+    ("STREET CLEANING THU 12PM-2PM", 0),
+]
+
+REGULATION_FIELDS = ["regulation", "days", "hrs_begin", "hrs_end", "max_hours"]
+
+
+def sample_rule(regulation, hours):
+    return {
+        "regulation": regulation,
+        "days": "MON_FRI",
+        "hrs_begin": "900" if hours > 0 else "",
+        "hrs_end": "1800" if hours > 0 else "",
+        "max_hours": hours
+    }
+
+
+def segment_ids(streets):
+    """Stable id per segment: the centerline network id (cnn) when available"""
+    if "cnn" in streets.properties:
+        ids = streets.column("cnn")
+        return [str(v) if v is not None else f"seg-{i}" for i, v in enumerate(ids)]
+    return [f"seg-{i}" for i in range(len(streets))]
+
+
+def parse_max_hours(value):
+    if value in (None, ""):
+        return None
+    hours = float(value)
+    return int(hours) if hours.is_integer() else hours
+
+
+def load_regulation_table(path):
+    """Read a CSV of segment_id,regulation,days,hrs_begin,hrs_end,max_hours"""
+    table = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            rule = {field: (row.get(field) or "").strip() for field in REGULATION_FIELDS}
+            rule["max_hours"] = parse_max_hours(rule["max_hours"])
+            table[row["segment_id"].strip()] = rule
+    return table
+
+
+class RegulationTable:
+    """
+    Regulation bound to every street segment, computed once at startup.
+
+    Segments share a small number of distinct rules, so each segment only
+    stores an index into self.rules.
+    """
+
+    def __init__(self, ids, codes, rules):
+        self.ids = ids
+        self.codes = codes
+        self.rules = rules
+        # Changes whenever any segment's rule changes; used in cache keys
+        digest = hashlib.sha1()
+        digest.update(json.dumps(rules, sort_keys=True).encode())
+        digest.update(np.ascontiguousarray(codes).tobytes())
+        self.version = digest.hexdigest()[:16]
+
+    @classmethod
+    def build(cls, streets, table_path="data/regulations.csv"):
+        """
+        Use the real regulation table when it exists; segments it does not
+        cover get a sample regulation picked deterministically from their id.
+        """
+        ids = segment_ids(streets)
+        table = load_regulation_table(table_path) if os.path.exists(table_path) else {}
+
+        rules = []
+        rule_codes = {}
+        codes = np.empty(len(ids), dtype=np.int32)
+        for i, segment_id in enumerate(ids):
+            rule = table.get(segment_id)
+            if rule is None:
+                choice = zlib.crc32(segment_id.encode()) % len(SAMPLE_REGULATIONS)
+                rule = sample_rule(*SAMPLE_REGULATIONS[choice])
+
+            key = json.dumps(rule, sort_keys=True)
+            if key not in rule_codes:
+                rule_codes[key] = len(rules)
+                rules.append(rule)
+            codes[i] = rule_codes[key]
+
+        return cls(ids, codes, rules)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rule(self, i):
+        """Regulation properties of segment i"""
+        return dict(self.rules[self.codes[i]])
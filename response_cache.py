@@ -0,0 +1,48 @@
+import gzip
+import json
+import threading
+from collections import OrderedDict
+
+
+class CachedPayload:
+    """A JSON response body serialized once, plus its gzip-compressed form"""
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, separators=(",", ":")).encode()
+        self.gzipped = gzip.compress(self.body, compresslevel=6)
+
+
+class ResponseCache:
+    """
+    Bounded, thread-safe LRU of pre-serialized JSON responses.
+
+    get() returns the cached payload for a key, or calls build() to produce
+    the payload object, serializes and compresses it once and keeps it.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, build):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+
+        # Build outside the lock so slow builds don't block cache hits;
+        # concurrent misses on the same key just build it twice
+        entry = CachedPayload(build())
+
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
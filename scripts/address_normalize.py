@@ -0,0 +1,91 @@
+import re
+
+import pandas as pd
+
+# Spelled-out street types -> the abbreviations the citation data mostly uses
+SUFFIXES = {
+    "STREET": "ST", "STR": "ST",
+    "AVENUE": "AVE", "AV": "AVE",
+    "BOULEVARD": "BLVD",
+    "DRIVE": "DR",
+    "TERRACE": "TER",
+    "COURT": "CT",
+    "ROAD": "RD",
+    "PLACE": "PL",
+    "LANE": "LN",
+    "CIRCLE": "CIR",
+    "ALLEY": "ALY",
+    "HIGHWAY": "HWY",
+    "PLAZA": "PLZ",
+    "CROSSING": "XING",
+}
+
+# "#5", "APT 3B", "UNIT 12", "STE 200" at the end of an address
+UNIT_PATTERN = re.compile(r"\s*(?:#\s*|\b(?:APT|UNIT|STE|SUITE|RM|ROOM)\s+)[A-Z0-9-]+$")
+# ", San Francisco, CA 94103" after the street
+CITY_PATTERN = re.compile(r"\s+SAN FRANCISCO(?:\s+CA)?(?:\s+\d{5})?$")
+# "1000-1099 BRYANT ST"
+RANGE_PATTERN = re.compile(r"^(\d+)\s*-\s*(\d+)\s+")
+# "1000 BLOCK OF BRYANT ST", "1000 BLK BRYANT ST"
+BLOCK_OF_PATTERN = re.compile(r"^(\d+)\s+(?:BLOCK|BLK)\s+(?:OF\s+)?")
+# Zero-padded numbered streets: "04TH AVE" -> "4TH AVE"
+ORDINAL_PATTERN = re.compile(r"\b0+(\d+(?:ST|ND|RD|TH))\b")
+HOUSE_NUMBER_PATTERN = re.compile(r"^(\d+)(\s+)")
+
+BLOCK = 100
+
+
+def block_midpoint(number, block_size=BLOCK):
+    """Middle house number of the block containing `number`"""
+    return number // block_size * block_size + block_size // 2
+
+
+def normalize_street(street):
+    """Canonical form of one street name (no house number)"""
+    street = ORDINAL_PATTERN.sub(r"\1", street)
+    words = street.split()
+    if len(words) > 1 and words[-1] in SUFFIXES:
+        words[-1] = SUFFIXES[words[-1]]
+    return " ".join(words)
+
+
+def normalize_address(address, block_size=None):
+    """
+    Canonical form of a citation address, so variants of the same place
+    share one key: uppercased, punctuation, city and units dropped,
+    zero-padded ordinals and spelled-out suffixes canonicalized, block ranges
+    ("1000-1099 X ST", "1000 BLOCK OF X ST") replaced by the mid-block
+    number. With block_size, every house number is bucketed to the middle
+    of its block. Intersections ("A ST/B ST") keep both streets.
+    Returns None for missing addresses.
+    """
+    if address is None or (not isinstance(address, str) and pd.isna(address)):
+        return None
+
+    address = " ".join(str(address).upper().replace(".", " ").replace(",", " ").split())
+    address = CITY_PATTERN.sub("", address)
+    address = UNIT_PATTERN.sub("", address)
+
+    if "/" in address:
+        return "/".join(normalize_street(part.strip()) for part in address.split("/") if part.strip())
+
+    match = RANGE_PATTERN.match(address) or BLOCK_OF_PATTERN.match(address)
+    if match:
+        number = block_midpoint(int(match.group(1)), block_size or BLOCK)
+        return f"{number} {normalize_street(address[match.end():])}"
+
+    match = HOUSE_NUMBER_PATTERN.match(address)
+    if match:
+        number = int(match.group(1))
+        if block_size:
+            number = block_midpoint(number, block_size)
+        return f"{number} {normalize_street(address[match.end():])}"
+
+    return normalize_street(address)
+
+
+def normalize_series(addresses, block_size=None):
+    """normalize_address over a Series, computed once per distinct value"""
+    distinct = pd.unique(addresses.dropna())
+    mapping = {address: normalize_address(address, block_size) for address in distinct}
+    return addresses.map(mapping)
@@ -0,0 +1,86 @@
+import argparse
+import csv
+import io
+import random
+import time
+
+import pandas as pd
+
+from create_location import apply_matches, parse_census_batch
+
+# create_location.py budgets ~2 minutes of Census time per batch
+CENSUS_SECONDS_PER_BATCH = 120
+STREETS = ["MISSION ST", "MARKET ST", "BRYANT ST", "FULTON ST", "GEARY BLVD", "VALENCIA ST", "19TH AVE"]
+
+
+def synthetic_addresses(n):
+    return [f"{i} {STREETS[i % len(STREETS)]}" for i in range(n)]
+
+
+def synthetic_response(batch_addresses, match_rate=0.9):
+    """A Census addressbatch response for the batch: mostly matches, some No_Match"""
+    out = io.StringIO()
+    writer = csv.writer(out, quoting=csv.QUOTE_ALL)
+    for i, address in enumerate(batch_addresses):
+        full = f"{address}, San Francisco, CA, "
+        if random.random() < match_rate:
+            lon, lat = -122.5 + random.random() * 0.15, 37.70 + random.random() * 0.11
+            writer.writerow([i, full, "Match", "Exact", f"{address}, SAN FRANCISCO, CA, 94103",
+                             f"{lon},{lat}", "123456", "L"])
+        else:
+            writer.writerow([i, full, "No_Match"])
+    return out.getvalue()
+
+
+def legacy_write_back(lookup_df, matches):
+    """The previous per-match write-back: two full-column scans per match"""
+    for address, lat, lon in matches:
+        lookup_df.loc[lookup_df['address'] == address, 'latitude'] = lat
+        lookup_df.loc[lookup_df['address'] == address, 'longitude'] = lon
+
+
+def run(n, batch_size, legacy):
+    random.seed(0)
+    addresses = synthetic_addresses(n)
+    batches = [addresses[i:i + batch_size] for i in range(0, n, batch_size)]
+    responses = [synthetic_response(batch) for batch in batches]
+
+    lookup_df = pd.DataFrame({'address': addresses, 'latitude': None, 'longitude': None})
+    positions = {address: i for i, address in enumerate(addresses)}
+
+    parse_seconds = 0.0
+    write_seconds = 0.0
+    legacy_seconds = 0.0
+    for batch, response in zip(batches, responses):
+        start = time.perf_counter()
+        matches, _, _ = parse_census_batch(response, batch)
+        parse_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        apply_matches(lookup_df, positions, matches)
+        write_seconds += time.perf_counter() - start
+
+        if legacy:
+            legacy_df = lookup_df[['address']].assign(latitude=None, longitude=None)
+            start = time.perf_counter()
+            legacy_write_back(legacy_df, matches)
+            legacy_seconds += time.perf_counter() - start
+
+    network_seconds = len(batches) * CENSUS_SECONDS_PER_BATCH
+    print(f"📦 {n} synthetic addresses in {len(batches)} batch(es) of {batch_size}")
+    print(f"   parse:      {parse_seconds:.3f}s")
+    print(f"   write-back: {write_seconds:.3f}s")
+    if legacy:
+        print(f"   legacy write-back: {legacy_seconds:.1f}s")
+    share = (parse_seconds + write_seconds) / network_seconds
+    print(f"⏱️  Post-processing is {share:.4%} of ~{network_seconds}s of Census requests")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Census batch post-processing on synthetic input")
+    parser.add_argument("--addresses", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--legacy", action="store_true", help="also time the old per-match .loc write-back (slow)")
+    args = parser.parse_args()
+
+    run(args.addresses, args.batch_size, args.legacy)
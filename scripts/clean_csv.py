@@ -1,25 +1,40 @@
+import argparse
 import pandas as pd
 import numpy as np
 
+from address_normalize import normalize_series
+
+OUTPUT_PATH = "../data/tickets_with_coords.parquet"
+CSV_EXPORT_PATH = "../data/tickets_with_coords.csv"
+
+parser = argparse.ArgumentParser(description="Attach geocoded coordinates to the filtered citations")
+parser.add_argument("--csv", action="store_true", help=f"also export {CSV_EXPORT_PATH}")
+parser.add_argument("--block-size", type=int, default=None,
+                    help="bucket house numbers to mid-block (use the same value as create_location.py)")
+args = parser.parse_args()
+
 # Load ticket dataset
-tickets = pd.read_csv("../data/filtered_data.csv", skiprows=0)
+tickets = pd.read_parquet("../data/filtered_data.parquet")
 coords = pd.read_csv("../data/cleaned_location_data.csv")
 
-# Standardize address columns for merge
-tickets['citation_location'] = tickets['citation_location'].astype(str).str.strip().str.upper()
-coords['address'] = coords['address'].astype(str).str.strip().str.upper()
+# Normalize both sides the same way create_location.py does before geocoding,
+# so spelling variants of an address join to the same coordinates
+tickets['address_key'] = normalize_series(tickets['citation_location'], args.block_size)
+coords['address_key'] = normalize_series(coords['address'], args.block_size)
+
+# One coordinate pair per normalized address
+coords = coords.dropna(subset=['address_key', 'latitude', 'longitude']).drop_duplicates('address_key')
 
-# Merge on address
+# Merge on normalized address
 merged_df = pd.merge(
     tickets,
-    coords[['address', 'latitude', 'longitude']],
-    left_on='citation_location',
-    right_on='address',
+    coords[['address_key', 'latitude', 'longitude']],
+    on='address_key',
     how='left'
 )
 
 # Drop redundant column
-merged_df = merged_df.drop(columns=['address'])
+merged_df = merged_df.drop(columns=['address_key'])
 
 # Clean column names
 merged_df.columns = merged_df.columns.str.strip().str.lower()
@@ -41,5 +56,7 @@ merged_df = merged_df.dropna(subset=['latitude', 'longitude'])
 print(merged_df[['citation_location', 'latitude', 'longitude']].head())
 print(f"Total rows after dropping missing coords: {len(merged_df)}")
 
-# Save merged dataset
-merged_df.to_csv("../data/tickets_with_coords.csv", index=False)
\ No newline at end of file
+# Save merged dataset; Parquet keeps the datetime / float / categorical types
+merged_df.to_parquet(OUTPUT_PATH, index=False)
+if args.csv:
+    merged_df.to_csv(CSV_EXPORT_PATH, index=False)
\ No newline at end of file
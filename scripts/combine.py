@@ -3,108 +3,24 @@ from folium.plugins import HeatMap
 import pandas as pd
 import requests
 from datetime import datetime
-from math import radians, sin, cos, sqrt, atan2
+import os
+import sys
 import webbrowser
-from sklearn.cluster import DBSCAN
 import numpy as np
 
+# Shared helpers (geo.py, heatmap.py, hotspots.py, parking_rules.py,
+# ticket_index.py) live at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from geo import within_radius
+from heatmap import bin_points
+from hotspots import HotspotState, summarize_clusters
+from ticket_index import TICKET_COLUMNS
+from parking_rules import CompiledRules
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
-def haversine_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance in miles between two lat/lon points"""
-    R = 3959  # Earth's radius in miles
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    return R * c
-
-def get_max_hours(properties):
-    """Helper function to determine parking hours"""
-    if 'max_hours' in properties and properties['max_hours'] is not None:
-        return properties['max_hours']
-    
-    begin = properties.get('hrs_begin') or properties.get('HRS_BEGIN')
-    end = properties.get('hrs_end') or properties.get('HRS_END')
-    
-    if begin and end:
-        try:
-            begin = int(begin)
-            end = int(end)
-            begin_hours = begin // 100 + (begin % 100) / 60
-            end_hours = end // 100 + (end % 100) / 60
-            duration = end_hours - begin_hours
-            if duration > 0:
-                return duration
-        except (ValueError, TypeError):
-            pass
-    
-    rule = str(properties.get('regulation') or properties.get('REGULATION') or '').upper()
-    
-    if any(x in rule for x in ['NO PARKING', 'TOW-AWAY', 'NO STOPPING']):
-        return 0
-    if '1 HR' in rule or '1HR' in rule or '1 HOUR' in rule:
-        return 1
-    if '2 HR' in rule or '2HR' in rule or '2 HOUR' in rule:
-        return 2
-    if '3 HR' in rule or '3HR' in rule or '3 HOUR' in rule:
-        return 3
-    if '4 HR' in rule or '4HR' in rule or '4 HOUR' in rule:
-        return 4
-    
-    return None
-
-def is_parking_allowed_now(properties, check_time=None):
-    """Check if parking is allowed at the given time"""
-    if check_time is None:
-        check_time = datetime.now()
-    
-    current_day = check_time.weekday()
-    day_names = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']
-    current_day_name = day_names[current_day]
-    current_time_int = check_time.hour * 100 + check_time.minute
-    
-    days = str(properties.get('days') or properties.get('DAYS') or '').upper()
-    begin = properties.get('hrs_begin') or properties.get('HRS_BEGIN')
-    end = properties.get('hrs_end') or properties.get('HRS_END')
-    regulation = str(properties.get('regulation') or properties.get('REGULATION') or '').upper()
-    
-    if days:
-        days_normalized = days.replace('_', '-')
-        if 'MON-FRI' in days_normalized or 'WEEKDAYS' in days_normalized:
-            if current_day >= 5:
-                return (True, None)
-        elif 'SAT-SUN' in days_normalized or 'WEEKENDS' in days_normalized:
-            if current_day < 5:
-                return (True, None)
-        elif current_day_name not in days:
-            return (True, None)
-    
-    if begin and end:
-        try:
-            begin_int = int(begin)
-            end_int = int(end)
-            
-            if current_time_int < begin_int or current_time_int > end_int:
-                return (True, None)
-            else:
-                if 'NO PARKING' in regulation or 'TOW-AWAY' in regulation:
-                    return (False, 0)
-                else:
-                    hours = get_max_hours(properties)
-                    return (True, hours)
-        except (ValueError, TypeError):
-            pass
-    
-    if 'NO PARKING' in regulation or 'TOW-AWAY' in regulation:
-        return (False, 0)
-    
-    hours = get_max_hours(properties)
-    return (True, hours)
-
 def get_color_by_availability(is_allowed, hours):
     """Get color based on whether parking is currently allowed"""
     if not is_allowed:
@@ -126,6 +42,8 @@ def get_color_by_availability(is_allowed, hours):
 
 
 usf_center = [37.7763, -122.4505]
+# Clustering state carried between runs (see HotspotState)
+HOTSPOT_STATE_PATH = "../data/hotspot_state.npz"
 check_time = datetime.now()
 
 print(f"🗺️  Creating combined parking map...")
@@ -140,18 +58,20 @@ m = folium.Map(location=usf_center, zoom_start=16)
 
 print("\n📍 Loading parking zones...")
 try:
-    response = requests.get("http://127.0.0.1:5001/zones")
+    # Ask for geometry simplified to the map's starting zoom
+    response = requests.get("http://127.0.0.1:5001/zones", params={"zoom": 16})
     data = response.json()
     
+    features = data.get('features', [])
     allowed_count = 0
     restricted_count = 0
     
-    for feature in data.get('features', []):
+    statuses = CompiledRules.from_features(features).statuses(check_time)
+    
+    for feature, (is_allowed, hours) in zip(features, statuses):
         props = feature['properties']
         coords = feature['geometry']['coordinates']
         
-        is_allowed, hours = is_parking_allowed_now(props, check_time)
-        
         if is_allowed:
             allowed_count += 1
         else:
@@ -194,7 +114,7 @@ except Exception as e:
 
 print("📊 Loading parking ticket data...")
 try:
-    df = pd.read_csv("../data/tickets_with_coords.csv")
+    df = pd.read_parquet("../data/tickets_with_coords.parquet", columns=["citation_number"] + TICKET_COLUMNS)
     df = df[(df["latitude"].notna()) & (df["longitude"].notna())]
     df = df[(df["latitude"] != 0) & (df["longitude"] != 0)]
 
@@ -217,15 +137,19 @@ try:
     df['violation_desc'] = df['violation_desc'].str.replace('BL ZNE BLK', 'Parked In Disabled Parking')
     df['violation_desc'] = df['violation_desc'].str.replace('SAFE/RED Z', 'Stopped In No Stopping Zone')
     
+    # Hotspot clusters over the whole citation history, kept in a state file
+    # so only citations added, dropped or re-geocoded since the last run change it
+    hotspots = HotspotState.load(HOTSPOT_STATE_PATH, eps_meters=20, min_samples=10)
+    added, removed = hotspots.update(df)
+    hotspots.save(HOTSPOT_STATE_PATH)
+    print(f"🔥 Hotspot state: {added} added, {removed} removed tickets, {len(hotspots.keys)} cells")
+
     # Filter to within 1 mile
-    df['distance_miles'] = df.apply(
-        lambda row: haversine_distance(usf_center[0], usf_center[1], 
-                                      row['latitude'], row['longitude']),
-        axis=1
-    )
-    df = df[df['distance_miles'] <= 1.0]
+    df = df[within_radius(df['latitude'].values, df['longitude'].values, usf_center, 1.0)]
     
-    heat_data = [[row['latitude'], row['longitude']] for idx, row in df.iterrows()]
+    # One weighted point per street-level bin instead of every ticket
+    bin_lats, bin_lons, bin_counts = bin_points(df['latitude'].values, df['longitude'].values, 18)
+    heat_data = np.column_stack([bin_lats, bin_lons, bin_counts]).tolist()
     
     # Add heatmap layer
     HeatMap(
@@ -244,30 +168,27 @@ try:
         }
     ).add_to(m)
     
-    print(f"✅ Added {len(heat_data)} ticket locations to heatmap")
+    print(f"✅ Added {len(df)} ticket locations to heatmap ({len(heat_data)} bins)")
 
-    # Find clusters using DBSCAN (groups nearby points)
-    coords = df[['latitude', 'longitude']].values
-    # eps controls how close points need to be (in degrees, ~0.0001 ≈ 11 meters)
-    clustering = DBSCAN(eps=0.0002, min_samples=10).fit(coords)
-    df['cluster'] = clustering.labels_
+    # Cluster of each ticket's cell in the hotspot state (-1 = no cluster)
+    df['cluster'] = hotspots.labels_for(df['latitude'].values, df['longitude'].values)
 
-    # Add clickable markers for significant clusters (10+ violations)
-    cluster_counts = df[df['cluster'] != -1].groupby('cluster').size()
-    significant_clusters = cluster_counts[cluster_counts >= 15]
+    # Summarize every cluster in one grouped pass (center, count, top violations,
+    # hour-of-day histogram) and add clickable markers for the significant ones
+    violation_codes, violation_names = pd.factorize(df['violation_desc'].fillna(''))
+    ticket_hours = pd.to_datetime(df['citation_issued_datetime'], errors='coerce').dt.hour.fillna(-1).values
+    summaries = summarize_clusters(df['cluster'].values, df['latitude'].values, df['longitude'].values,
+                                   violation_codes, list(violation_names), hours=ticket_hours)
+    significant_clusters = [summary for summary in summaries if summary['count'] >= 15]
 
     print(f"\n📊 Found {len(significant_clusters)} clusters with 10+ violations:")
 
-    for cluster_id in significant_clusters.index:
-        cluster_data = df[df['cluster'] == cluster_id]
-        count = len(cluster_data)
-        
-        # Get cluster center
-        center_lat = cluster_data['latitude'].mean()
-        center_lon = cluster_data['longitude'].mean()
-        
-        # Get most common violation types in this cluster
-        top_violations = cluster_data['violation_desc'].value_counts().head(3)
+    for summary in significant_clusters:
+        cluster_id = summary['cluster']
+        count = summary['count']
+        center_lat, center_lon = summary['latitude'], summary['longitude']
+        top_violations = summary['top_violations']
+        busiest_hour = int(np.argmax(summary['hours']))
         
         # Create popup content
         popup_html = f"""
@@ -279,10 +200,10 @@ try:
             <ul style="margin: 5px 0; padding-left: 20px; font-size: 11px;">
         """
         
-        for violation, vcount in top_violations.items():
+        for violation, vcount in top_violations:
             popup_html += f"<li>{violation[:40]}... ({vcount})</li>"
         
-        popup_html += "</ul></div>"
+        popup_html += f"</ul><p style=\"margin: 5px 0; font-size: 11px;\">Most tickets around {busiest_hour:02d}:00</p></div>"
         
         # Add clickable marker
         folium.CircleMarker(
@@ -297,7 +218,7 @@ try:
         ).add_to(m)
         
         print(f"  • Cluster #{cluster_id}: {count} violations at ({center_lat:.4f}, {center_lon:.4f})")
-        print(f"    Top violation: {top_violations.index[0]}")
+        print(f"    Top violation: {top_violations[0][0]}")
     
 except Exception as e:
     print(f"⚠️  Could not load ticket data: {e}")
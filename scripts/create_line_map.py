@@ -1,105 +1,12 @@
 import folium
+import os
 import requests
+import sys
 from datetime import datetime
 
-
-def get_max_hours(properties):
-    """Helper function to determine parking hours"""
-    if 'max_hours' in properties and properties['max_hours'] is not None:
-        return properties['max_hours']
-    
-    begin = properties.get('hrs_begin') or properties.get('HRS_BEGIN')
-    end = properties.get('hrs_end') or properties.get('HRS_END')
-    
-    if begin and end:
-        try:
-            begin = int(begin)
-            end = int(end)
-            begin_hours = begin // 100 + (begin % 100) / 60
-            end_hours = end // 100 + (end % 100) / 60
-            duration = end_hours - begin_hours
-            if duration > 0:
-                return duration
-        except (ValueError, TypeError):
-            pass
-    
-    rule = str(properties.get('regulation') or properties.get('REGULATION') or '').upper()
-    
-    if any(x in rule for x in ['NO PARKING', 'TOW-AWAY', 'NO STOPPING']):
-        return 0
-    if '1 HR' in rule or '1HR' in rule or '1 HOUR' in rule:
-        return 1
-    if '2 HR' in rule or '2HR' in rule or '2 HOUR' in rule:
-        return 2
-    if '3 HR' in rule or '3HR' in rule or '3 HOUR' in rule:
-        return 3
-    if '4 HR' in rule or '4HR' in rule or '4 HOUR' in rule:
-        return 4
-    
-    return None
-
-
-def is_parking_allowed_now(properties, check_time=None):
-    """
-    Check if parking is allowed at the given time
-    Returns: (is_allowed: bool, hours_available: float or None)
-    """
-    if check_time is None:
-        check_time = datetime.now()
-    
-    # Get day of week (0 = Monday, 6 = Sunday)
-    current_day = check_time.weekday()
-    day_names = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']
-    current_day_name = day_names[current_day]
-    
-    # Get current time as HHMM (e.g., 1430 for 2:30 PM)
-    current_time_int = check_time.hour * 100 + check_time.minute
-    
-    # Get zone properties
-    days = str(properties.get('days') or properties.get('DAYS') or '').upper()
-    begin = properties.get('hrs_begin') or properties.get('HRS_BEGIN')
-    end = properties.get('hrs_end') or properties.get('HRS_END')
-    regulation = str(properties.get('regulation') or properties.get('REGULATION') or '').upper()
-    
-    # Check if today is in the allowed days
-    if days:
-        # Handle common day formats (with or without hyphens/underscores)
-        days_normalized = days.replace('_', '-')
-        if 'MON-FRI' in days_normalized or 'WEEKDAYS' in days_normalized:
-            if current_day >= 5:  # Saturday or Sunday
-                return (True, None)  # No restriction on weekends
-        elif 'SAT-SUN' in days_normalized or 'WEEKENDS' in days_normalized:
-            if current_day < 5:  # Monday-Friday
-                return (True, None)  # No restriction on weekdays
-        elif current_day_name not in days:
-            return (True, None)  # Not restricted on this day
-    
-    # Check if current time is within restriction hours
-    if begin and end:
-        try:
-            begin_int = int(begin)
-            end_int = int(end)
-            
-            # If current time is outside restriction hours, parking is allowed
-            if current_time_int < begin_int or current_time_int > end_int:
-                return (True, None)  # Outside restricted hours
-            else:
-                # Within restricted hours - check what type of restriction
-                if 'NO PARKING' in regulation or 'TOW-AWAY' in regulation:
-                    return (False, 0)  # No parking allowed
-                else:
-                    # Time-limited parking
-                    hours = get_max_hours(properties)
-                    return (True, hours)  # Parking allowed with time limit
-        except (ValueError, TypeError):
-            pass
-    
-    # Default: check regulation
-    if 'NO PARKING' in regulation or 'TOW-AWAY' in regulation:
-        return (False, 0)
-    
-    hours = get_max_hours(properties)
-    return (True, hours)
+# Shared helpers (parking_rules.py) live at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from parking_rules import CompiledRules, RuleTimeline
 
 
 def get_color_by_availability(is_allowed, hours):
@@ -129,21 +36,29 @@ print(f"🕐 Checking parking availability for: {check_time.strftime('%A, %B %d,
 
 # Fetch parking zones from your local server
 try:
-    response = requests.get("http://127.0.0.1:5001/zones")
+    # Ask for geometry simplified to the map's starting zoom
+    response = requests.get("http://127.0.0.1:5001/zones", params={"zoom": 16})
     data = response.json()
     
-    print(f"📍 Loaded {len(data.get('features', []))} parking zones")
+    features = data.get('features', [])
+    print(f"📍 Loaded {len(features)} parking zones")
     
     allowed_count = 0
     restricted_count = 0
     
+    # Check if parking is allowed NOW for every zone in one pass
+    rules = CompiledRules.from_features(features)
+    statuses = rules.statuses(check_time)
+    timelines = RuleTimeline.build_all(rules)
+    
     # Add each parking zone as a polyline
-    for feature in data.get('features', []):
+    for feature, (is_allowed, hours), timeline in zip(features, statuses, timelines):
         props = feature['properties']
         coords = feature['geometry']['coordinates']
         
-        # Check if parking is allowed NOW
-        is_allowed, hours = is_parking_allowed_now(props, check_time)
+        # When does the current status end?
+        next_change = timeline.next_change(check_time)
+        next_change_text = next_change[0].strftime('%a %I:%M %p') if next_change else "Never"
         
         if is_allowed:
             allowed_count += 1
@@ -165,6 +80,7 @@ try:
             <p style="margin: 5px 0;"><strong>Days:</strong> {props.get('days') or props.get('DAYS') or 'N/A'}</p>
             <p style="margin: 5px 0;"><strong>Hours:</strong> {props.get('hrs_begin') or props.get('HRS_BEGIN') or 'N/A'} - {props.get('hrs_end') or props.get('HRS_END') or 'N/A'}</p>
             <p style="margin: 5px 0;"><strong>Current Status:</strong> {f"{hours} hour limit" if hours and is_allowed else "No parking" if not is_allowed else "Unrestricted"}</p>
+            <p style="margin: 5px 0;"><strong>Changes:</strong> {next_change_text}</p>
             <p style="margin: 5px 0; font-size: 11px; color: #666;"><em>As of {check_time.strftime('%I:%M %p')}</em></p>
         </div>
         """
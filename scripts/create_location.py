@@ -3,14 +3,142 @@ import requests
 import time
 import csv
 import io
+import os
+import json
+import hashlib
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+from address_normalize import normalize_series
+from geocode_cache import DEFAULT_CACHE_PATH, GeocodeCache
+from offline_geocoder import DEFAULT_STREETS_PATH, load_offline_geocoder
 
-def geocode_with_census_batch(input_csv, output_csv, batch_size=10000):
+CENSUS_SOURCE = "census"
+# Point CENSUS_GEOCODER_URL at a local stand-in to test without the real API
+CENSUS_URL = os.getenv("CENSUS_GEOCODER_URL",
+                       "https://geocoding.geo.census.gov/geocoder/locations/addressbatch")
+DEFAULT_CHECKPOINT_PATH = "../data/census_checkpoint.json"
+
+# Batches in flight at once. A failed batch is split in half down to
+# MIN_SPLIT_SIZE addresses; smaller ones are retried up to MAX_ATTEMPTS times
+# before they are given up on for this run
+WORKERS = 4
+MIN_SPLIT_SIZE = 500
+MAX_ATTEMPTS = 3
+
+
+def parse_census_batch(response_text, batch_addresses):
+    """
+    Parse a Census batch response (rows keyed by the id we sent, i.e. the
+    index into batch_addresses).
+    Returns (matches as [(address, lat, lon)], definite no-match addresses,
+    number of addresses without coordinates).
+    """
+    matches = []
+    misses = []
+    failed = 0
+    
+    # Parse the response using CSV reader (handles quoted fields properly!)
+    for row in csv.reader(io.StringIO(response_text)):
+        # No_Match rows only carry id, address and status
+        if len(row) < 3:
+            continue
+        try:
+            address = batch_addresses[int(row[0])]
+            match_status = row[2]
+            
+            # Coordinates are in row[5] as "longitude,latitude"
+            coords_str = row[5] if len(row) >= 6 else ""
+            if match_status == "Match" and ',' in coords_str:
+                lon_str, lat_str = coords_str.split(',')
+                matches.append((address, float(lat_str.strip()), float(lon_str.strip())))
+            else:
+                # Remember definite misses; ties may resolve later
+                if match_status == "No_Match":
+                    misses.append(address)
+                failed += 1
+                
+        except (ValueError, IndexError) as e:
+            print(f"   ⚠️  Parse error: {e}")
+            failed += 1
+    
+    return matches, misses, failed
+
+
+def apply_matches(lookup_df, positions, matches):
+    """Write (address, lat, lon) matches into lookup_df with one vectorized assignment"""
+    if not matches:
+        return
+    rows = [positions[address] for address, _, _ in matches]
+    lookup_df.loc[rows, ['latitude', 'longitude']] = [[lat, lon] for _, lat, lon in matches]
+
+
+def batch_id(batch_addresses):
+    """Stable id of a batch, used in the checkpoint manifest"""
+    return hashlib.sha1("\n".join(batch_addresses).encode()).hexdigest()[:16]
+
+
+def load_checkpoint(checkpoint_path):
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            return set(json.load(f)["completed"])
+    return set()
+
+
+def save_checkpoint(checkpoint_path, completed):
+    with open(f"{checkpoint_path}.tmp", "w") as f:
+        json.dump({"completed": sorted(completed)}, f, indent=1)
+    os.replace(f"{checkpoint_path}.tmp", checkpoint_path)
+
+
+def submit_census_batch(batch_addresses, url=CENSUS_URL, delay=0):
+    """POST one batch to the Census API (after `delay` seconds); returns parse_census_batch() of the answer"""
+    time.sleep(delay)
+    
+    # Format: Unique ID, Street address, City, State, ZIP
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for i, address in enumerate(batch_addresses):
+        # Add San Francisco, CA to each address
+        writer.writerow([i, address, "San Francisco", "CA", ""])
+    
+    files = {
+        'addressFile': ('addresses.csv', out.getvalue(), 'text/csv')
+    }
+    
+    data = {
+        'benchmark': 'Public_AR_Current'
+    }
+    
+    response = requests.post(url, files=files, data=data, timeout=300)
+    response.raise_for_status()
+    return parse_census_batch(response.text, batch_addresses)
+
+
+def geocode_with_census_batch(input_path, output_csv, batch_size=10000, cache_path=DEFAULT_CACHE_PATH,
+                              checkpoint_path=DEFAULT_CHECKPOINT_PATH, workers=WORKERS, url=CENSUS_URL,
+                              block_size=None, streets_path=DEFAULT_STREETS_PATH):
     """
     Geocode addresses using US Census Bureau Geocoding API (FREE, no limits!)
     Uses batch mode to process up to 10,000 addresses at once.
     Results can be stored permanently with no restrictions.
     
+    Addresses are first placed offline by interpolating along the street
+    centerlines in streets_path (OfflineGeocoder); only the rest go through
+    the geocode cache and the Census API. Addresses already in the cache are
+    not sent again; every match and definite no-match is added to it after
+    each batch.
+    
+    Addresses are normalized (address_normalize) before deduplication, so
+    spelling variants of one place are geocoded once; with block_size, all
+    house numbers are bucketed to mid-block.
+    
+    Up to `workers` batches are in flight at once. Batches are fixed chunks
+    of the sorted addresses, and each one is recorded in the checkpoint
+    manifest once all of its addresses are answered, so a rerun skips it
+    (ties included). A batch whose request fails is split in half and both
+    halves retried; batches under MIN_SPLIT_SIZE get MAX_ATTEMPTS tries.
+    
     No API key needed!
     """
     print("=" * 70)
@@ -18,120 +146,107 @@ def geocode_with_census_batch(input_csv, output_csv, batch_size=10000):
     print("=" * 70)
     
     # Load data
-    print(f"\n📂 Loading data from: {input_csv}")
-    df = pd.read_csv(input_csv)
+    print(f"\n📂 Loading data from: {input_path}")
+    df = pd.read_parquet(input_path, columns=['citation_location'])
     print(f"✅ Total records: {len(df)}")
     
-    # Get unique addresses
-    unique_addresses = df['citation_location'].unique()
-    print(f"🏠 Unique addresses found: {len(unique_addresses)}")
+    # Get unique normalized addresses, sorted so batches come out the same every run
+    raw_count = df['citation_location'].nunique()
+    unique_addresses = sorted(normalize_series(df['citation_location'], block_size).dropna().unique())
+    print(f"🏠 Unique addresses found: {len(unique_addresses)} ({raw_count} before normalization)")
+    
+    # Create lookup dataframe, filled in from earlier answers where possible
+    offline = load_offline_geocoder(streets_path)
+    start_time = time.time()
+    located = offline.locate_many(unique_addresses) if offline is not None else {}
+    print(f"🗺️  {len(located)} addresses placed offline in {time.time() - start_time:.1f}s")
     
-    # Create lookup dataframe
+    cache = GeocodeCache(cache_path)
+    cached = cache.get_many([a for a in unique_addresses if a not in located], CENSUS_SOURCE)
+    answers = {**cached, **located}
     lookup_df = pd.DataFrame({
         'address': unique_addresses,
-        'latitude': None,
-        'longitude': None
+        'latitude': [answers.get(a, (None, None))[0] for a in unique_addresses],
+        'longitude': [answers.get(a, (None, None))[1] for a in unique_addresses]
     })
     
-    # Calculate number of batches needed
-    num_batches = (len(unique_addresses) + batch_size - 1) // batch_size
-    print(f"📦 Will process in {num_batches} batch(es) of up to {batch_size} addresses")
-    print(f"⏱️  Estimated time: ~{num_batches * 2} minutes (Census API is fast!)")
+    # Row of each address in lookup_df, for writing results back by position
+    positions = {address: i for i, address in enumerate(unique_addresses)}
+    
+    # Batches finished in an earlier run are skipped; the rest only send the
+    # addresses that were never answered
+    completed = load_checkpoint(checkpoint_path)
+    batches = {}
+    for start_idx in range(0, len(unique_addresses), batch_size):
+        chunk = unique_addresses[start_idx:start_idx + batch_size]
+        chunk_id = batch_id(chunk)
+        pending = [a for a in chunk if a not in answers]
+        if chunk_id not in completed and pending:
+            batches[chunk_id] = pending
+    
+    num_pending = sum(len(b) for b in batches.values())
+    print(f"💾 {len(cached)} addresses answered from the geocode cache")
+    print(f"📦 {len(batches)} batch(es) to geocode ({num_pending} addresses), {workers} at a time")
     print(f"\n🚀 Starting geocoding...\n")
     
     successful = 0
     failed = 0
     
-    # Process in batches
-    for batch_num in range(num_batches):
-        start_idx = batch_num * batch_size
-        end_idx = min((batch_num + 1) * batch_size, len(unique_addresses))
-        batch_addresses = unique_addresses[start_idx:end_idx]
-        
-        print(f"📦 Processing batch {batch_num + 1}/{num_batches} ({len(batch_addresses)} addresses)")
-        
-        # Create CSV content for this batch
-        # Format: Unique ID, Street address, City, State, ZIP
-        batch_csv_lines = []
-        for i, address in enumerate(batch_addresses):
-            # Add San Francisco, CA to each address
-            batch_csv_lines.append(f"{i},{address},San Francisco,CA,")
+    # Outstanding requests per batch, and batches with an address given up on
+    outstanding = {chunk_id: 1 for chunk_id in batches}
+    incomplete = set()
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(chunk_id, addresses, attempt, delay=0):
+            future = executor.submit(submit_census_batch, addresses, url, delay)
+            running[future] = (chunk_id, addresses, attempt)
         
-        batch_csv_content = "\n".join(batch_csv_lines)
+        running = {}
+        for chunk_id, addresses in batches.items():
+            submit(chunk_id, addresses, 1)
         
-        try:
-            # Submit batch to Census API
-            url = "https://geocoding.geo.census.gov/geocoder/locations/addressbatch"
-            
-            files = {
-                'addressFile': ('addresses.csv', batch_csv_content, 'text/csv')
-            }
-            
-            data = {
-                'benchmark': 'Public_AR_Current'
-            }
-            
-            response = requests.post(url, files=files, data=data, timeout=120)
-            response.raise_for_status()
-            
-            # Parse the response using CSV reader (handles quoted fields properly!)
-            csv_reader = csv.reader(io.StringIO(response.text))
-            
-            batch_successful = 0
-            batch_failed = 0
-            
-            for row in csv_reader:
-                if len(row) >= 6:
-                    try:
-                        idx = int(row[0])
-                        match_status = row[2]
-                        
-                        if match_status == "Match":
-                            # Coordinates are in row[5] as "longitude,latitude"
-                            coords_str = row[5]
-                            
-                            if coords_str and ',' in coords_str:
-                                lon_str, lat_str = coords_str.split(',')
-                                lon = float(lon_str.strip())
-                                lat = float(lat_str.strip())
-                                
-                                # Update lookup table
-                                address = batch_addresses[idx]
-                                lookup_df.loc[lookup_df['address'] == address, 'latitude'] = lat
-                                lookup_df.loc[lookup_df['address'] == address, 'longitude'] = lon
-                                
-                                batch_successful += 1
-                                successful += 1
-                            else:
-                                batch_failed += 1
-                                failed += 1
-                        else:
-                            batch_failed += 1
-                            failed += 1
-                            
-                    except (ValueError, IndexError) as e:
-                        print(f"   ⚠️  Parse error: {e}")
-                        batch_failed += 1
-                        failed += 1
-                        continue
-            
-            print(f"   ✓ Batch complete: {batch_successful} successful, {batch_failed} failed")
-            print(f"   📊 Running totals: {successful} successful, {failed} failed")
-            
-            # Save progress after each batch
-            lookup_df.to_csv(output_csv, index=False)
-            print(f"   💾 Progress saved to {output_csv}")
-            
-            # Brief pause between batches to be respectful
-            if batch_num < num_batches - 1:
-                time.sleep(2)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk_id, addresses, attempt = running.pop(future)
+                outstanding[chunk_id] -= 1
                 
-        except Exception as e:
-            print(f"   ❌ Error processing batch: {e}")
-            failed += len(batch_addresses)
+                try:
+                    matches, misses, batch_failed = future.result()
+                except Exception as e:
+                    if len(addresses) >= 2 * MIN_SPLIT_SIZE:
+                        # Split and retry both halves
+                        half = len(addresses) // 2
+                        print(f"   ⚠️  Batch of {len(addresses)} failed ({e}); retrying as two halves")
+                        submit(chunk_id, addresses[:half], attempt)
+                        submit(chunk_id, addresses[half:], attempt)
+                        outstanding[chunk_id] += 2
+                    elif attempt < MAX_ATTEMPTS:
+                        print(f"   ⚠️  Batch of {len(addresses)} failed ({e}); retry {attempt}/{MAX_ATTEMPTS - 1}")
+                        submit(chunk_id, addresses, attempt + 1, delay=2 ** attempt)
+                        outstanding[chunk_id] += 1
+                    else:
+                        print(f"   ❌ Giving up on {len(addresses)} addresses for this run: {e}")
+                        failed += len(addresses)
+                        incomplete.add(chunk_id)
+                else:
+                    # Write the whole answer back in one go
+                    apply_matches(lookup_df, positions, matches)
+                    cache.put_many(matches + [(address, None, None) for address in misses], CENSUS_SOURCE)
+                    successful += len(matches)
+                    failed += batch_failed
+                    print(f"   ✓ {len(addresses)} addresses: {len(matches)} successful, {batch_failed} failed")
+                
+                if outstanding[chunk_id] == 0:
+                    # Results are in the cache before the batch is marked done
+                    if chunk_id not in incomplete:
+                        completed.add(chunk_id)
+                        save_checkpoint(checkpoint_path, completed)
+                    print(f"   📊 Running totals: {successful} successful, {failed} failed")
     
     # Final save
     lookup_df.to_csv(output_csv, index=False)
+    cache.close()
     
     print(f"\n" + "=" * 70)
     print("✅ GEOCODING COMPLETE!")
@@ -151,13 +266,33 @@ def geocode_with_census_batch(input_csv, output_csv, batch_size=10000):
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description="Geocode citation addresses with the Census batch API")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--url", default=CENSUS_URL)
+    parser.add_argument("--streets", default=DEFAULT_STREETS_PATH,
+                        help="street centerlines for offline geocoding")
+    parser.add_argument("--block-size", type=int, default=None,
+                        help="bucket house numbers to mid-block (use the same value for clean_csv.py)")
+    args = parser.parse_args()
+
     # Process 50,000 addresses in 5 batches of 10,000
-    INPUT_CSV = "../data/filtered_data.csv"
+    INPUT_PATH = "../data/filtered_data.parquet"
     OUTPUT_CSV = "../data/location_data.csv"
 
+    # Answers from runs before the geocode cache existed
+    seeded = GeocodeCache().seed_from_csv(OUTPUT_CSV, CENSUS_SOURCE)
+    if seeded:
+        print(f"💾 Seeded the geocode cache with {seeded} addresses from {OUTPUT_CSV}")
+
     lookup_table = geocode_with_census_batch(
-        input_csv=INPUT_CSV,
-        output_csv=OUTPUT_CSV
+        input_path=INPUT_PATH,
+        output_csv=OUTPUT_CSV,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        url=args.url,
+        block_size=args.block_size,
+        streets_path=args.streets
     )
 
-# Done! Your lookup table is ready.
\ No newline at end of file
+# Done! Your lookup table is ready.
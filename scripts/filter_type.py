@@ -1,13 +1,35 @@
-import pandas as pd 
+import argparse
+import os
 
-df = pd.read_csv("../data/ticket_data.csv", low_memory=False)
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-desired_types = ["STR CLEAN", "PRK PROHIB", "PKG PROHIB", "NO PRK ZN", "DISOB SIGN", "NO PERMIT", "TMP PK RES", "METER DTN", "MTR OUT DT", "FIRE HYD", "RED ZONE", "YEL ZONE", "WHITE ZONE", "GREEN ZONE", "BLK BIKE L", "BL ZNE BLK", "SAFE/RED Z"]
+from ticket_store import TicketStore
+from ticket_types import DESIRED_TYPES, KEEP_COLUMNS, TICKET_SCHEMA
 
-df_filtered = df[df["violation_desc"].isin(desired_types)]
+OUTPUT_PATH = "../data/filtered_data.parquet"
+CSV_EXPORT_PATH = "../data/filtered_data.csv"
 
-unique_addresses = df_filtered["citation_location"].nunique()
+parser = argparse.ArgumentParser(description="Export the stored citations of the desired violation types")
+parser.add_argument("--csv", action="store_true", help=f"also export {CSV_EXPORT_PATH}")
+args = parser.parse_args()
 
-print("Unique addresses:", unique_addresses)
+# Citations ingested by pull_data.py are already filtered to DESIRED_TYPES;
+# the export streams them one partition (row group) at a time, so memory
+# stays bounded however many months are stored
+if args.csv and os.path.exists(CSV_EXPORT_PATH):
+    os.remove(CSV_EXPORT_PATH)
 
-df_filtered.to_csv("../data/filtered_data.csv")
+rows = 0
+addresses = set()
+with pq.ParquetWriter(OUTPUT_PATH, TICKET_SCHEMA) as writer:
+    for df in TicketStore(schema=TICKET_SCHEMA).iter_parts(columns=KEEP_COLUMNS):
+        df_filtered = df[df["violation_desc"].isin(DESIRED_TYPES)]
+        addresses.update(df_filtered["citation_location"].dropna())
+        writer.write_table(pa.Table.from_pandas(df_filtered, schema=TICKET_SCHEMA, preserve_index=False))
+        if args.csv:
+            df_filtered.to_csv(CSV_EXPORT_PATH, mode="a", header=rows == 0, index=False)
+        rows += len(df_filtered)
+
+print("Filtered citations:", rows)
+print("Unique addresses:", len(addresses))
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from address_normalize import normalize_address
+
+DEFAULT_CACHE_PATH = "../data/geocode_cache.sqlite"
+# SQLite caps the number of ? parameters per statement
+QUERY_CHUNK = 500
+
+
+class GeocodeCache:
+    """
+    Geocoding answers kept in SQLite, keyed on the normalized address
+    (address_normalize.normalize_address) and the geocoder (source) that
+    gave them.
+
+    A match from any source is reused by every caller. A definite "no match"
+    is only remembered for the source that gave it, so a Census miss can
+    still be tried on Google. Network errors are never cached.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS geocodes ("
+            " address TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " latitude REAL,"
+            " longitude REAL,"
+            " updated_at TEXT NOT NULL,"
+            " PRIMARY KEY (address, source))"
+        )
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(DISTINCT address) FROM geocodes").fetchone()[0]
+
+    def get_many(self, addresses, source):
+        """
+        {address: (lat, lon)} for the addresses already answered: a match
+        from any source, or (None, None) for a no-match from `source`.
+        Addresses missing from the result still need geocoding.
+        """
+        keys = {}
+        for address in addresses:
+            key = normalize_address(address)
+            if key is not None:
+                keys.setdefault(key, []).append(address)
+
+        found = {}
+        key_list = list(keys)
+        for start in range(0, len(key_list), QUERY_CHUNK):
+            chunk = key_list[start:start + QUERY_CHUNK]
+            rows = self.connection.execute(
+                f"SELECT address, source, latitude, longitude FROM geocodes"
+                f" WHERE address IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for key, row_source, lat, lon in rows:
+                if lat is not None:
+                    found[key] = (lat, lon)
+                elif row_source == source:
+                    found.setdefault(key, (None, None))
+
+        return {address: found[key] for key, originals in keys.items() if key in found for address in originals}
+
+    def get(self, address, source):
+        return self.get_many([address], source).get(address)
+
+    def put_many(self, results, source):
+        """Store (address, lat, lon) answers from `source`; lat/lon None = no match"""
+        now = datetime.now().isoformat(timespec="seconds")
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO geocodes (address, source, latitude, longitude, updated_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            [(normalize_address(address), source, lat, lon, now)
+             for address, lat, lon in results if normalize_address(address) is not None],
+        )
+        self.connection.commit()
+
+    def put(self, address, lat, lon, source):
+        self.put_many([(address, lat, lon)], source)
+
+    def seed_from_csv(self, path, source):
+        """Load matched rows of an existing address,latitude,longitude table, keeping cached answers"""
+        if not os.path.exists(path):
+            return 0
+
+        df = pd.read_csv(path, usecols=["address", "latitude", "longitude"]).dropna()
+        now = datetime.now().isoformat(timespec="seconds")
+        before = self.connection.total_changes
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO geocodes (address, source, latitude, longitude, updated_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            [(normalize_address(a), source, float(lat), float(lon), now)
+             for a, lat, lon in df.itertuples(index=False)],
+        )
+        self.connection.commit()
+        return self.connection.total_changes - before
+
+    def close(self):
+        self.connection.close()
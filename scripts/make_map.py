@@ -1,13 +1,23 @@
 import folium
 from folium.plugins import HeatMap
+import os
 import pandas as pd
+import sys
 import webbrowser
-from sklearn.cluster import DBSCAN
 import numpy as np
-from math import radians, sin, cos, sqrt, atan2
+
+# Shared helpers (geo.py, heatmap.py, hotspots.py, ticket_index.py) live at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from geo import within_radius
+from heatmap import bin_points
+from hotspots import HotspotState, summarize_clusters
+from ticket_index import TICKET_COLUMNS
+
+# Clustering state carried between runs (see HotspotState)
+HOTSPOT_STATE_PATH = "../data/hotspot_state.npz"
 
 # Load your filtered ticket data
-df = pd.read_csv("../data/tickets_with_coords.csv")  
+df = pd.read_parquet("../data/tickets_with_coords.parquet", columns=["citation_number"] + TICKET_COLUMNS)
 
 # Keep only rows with valid coordinates
 df = df[(df["latitude"].notna()) & (df["longitude"].notna())]
@@ -34,37 +44,28 @@ df['violation_desc'] = df['violation_desc'].str.replace('SAFE/RED Z', 'Stopped I
 
 
 
+# Hotspot clusters over the whole citation history, kept in a state file
+# so only citations added, dropped or re-geocoded since the last run change it
+hotspots = HotspotState.load(HOTSPOT_STATE_PATH, eps_meters=20, min_samples=10)
+added, removed = hotspots.update(df)
+hotspots.save(HOTSPOT_STATE_PATH)
+print(f"🔥 Hotspot state: {added} added, {removed} removed tickets, {len(hotspots.keys)} cells")
+
 # Center of USF
 usf_center = [37.7763, -122.4505]
 
 # Filter to within 1 mile of USF center
-def haversine_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance in miles between two lat/lon points"""
-    R = 3959  # Earth's radius in miles
-    
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    
-    return R * c
-
-# Calculate distance and filter
-df['distance_miles'] = df.apply(
-    lambda row: haversine_distance(usf_center[0], usf_center[1], row['latitude'], row['longitude']),
-    axis=1
-)
-df = df[df['distance_miles'] <= 1.0]
+df = df[within_radius(df['latitude'].values, df['longitude'].values, usf_center, 1.0)]
 
 print(f"🔍 Filtered to tickets within 1 mile: {len(df)} tickets")
 
 # Create base map
 m = folium.Map(location=usf_center, zoom_start=16)
 
-# Prepare data for heatmap
-heat_data = [[row['latitude'], row['longitude']] for idx, row in df.iterrows()]
+# Prepare data for heatmap: one weighted point per street-level bin instead
+# of every ticket, which keeps the saved HTML small
+bin_lats, bin_lons, bin_counts = bin_points(df['latitude'].values, df['longitude'].values, 18)
+heat_data = np.column_stack([bin_lats, bin_lons, bin_counts]).tolist()
 
 # Add heatmap layer
 HeatMap(
@@ -82,28 +83,25 @@ HeatMap(
     }
 ).add_to(m)
 
-# Find clusters using DBSCAN (groups nearby points)
-coords = df[['latitude', 'longitude']].values
-# eps controls how close points need to be (in degrees, ~0.0001 ≈ 11 meters)
-clustering = DBSCAN(eps=0.0002, min_samples=10).fit(coords)
-df['cluster'] = clustering.labels_
+# Cluster of each ticket's cell in the hotspot state (-1 = no cluster)
+df['cluster'] = hotspots.labels_for(df['latitude'].values, df['longitude'].values)
 
-# Add clickable markers for significant clusters (10+ violations)
-cluster_counts = df[df['cluster'] != -1].groupby('cluster').size()
-significant_clusters = cluster_counts[cluster_counts >= 15]
+# Summarize every cluster in one grouped pass (center, count, top violations,
+# hour-of-day histogram) and add clickable markers for the significant ones
+violation_codes, violation_names = pd.factorize(df['violation_desc'].fillna(''))
+ticket_hours = pd.to_datetime(df['citation_issued_datetime'], errors='coerce').dt.hour.fillna(-1).values
+summaries = summarize_clusters(df['cluster'].values, df['latitude'].values, df['longitude'].values,
+                               violation_codes, list(violation_names), hours=ticket_hours)
+significant_clusters = [summary for summary in summaries if summary['count'] >= 15]
 
 print(f"\n📊 Found {len(significant_clusters)} clusters with 10+ violations:")
 
-for cluster_id in significant_clusters.index:
-    cluster_data = df[df['cluster'] == cluster_id]
-    count = len(cluster_data)
-    
-    # Get cluster center
-    center_lat = cluster_data['latitude'].mean()
-    center_lon = cluster_data['longitude'].mean()
-    
-    # Get most common violation types in this cluster
-    top_violations = cluster_data['violation_desc'].value_counts().head(3)
+for summary in significant_clusters:
+    cluster_id = summary['cluster']
+    count = summary['count']
+    center_lat, center_lon = summary['latitude'], summary['longitude']
+    top_violations = summary['top_violations']
+    busiest_hour = int(np.argmax(summary['hours']))
     
     # Create popup content
     popup_html = f"""
@@ -115,10 +113,10 @@ for cluster_id in significant_clusters.index:
         <ul style="margin: 5px 0; padding-left: 20px; font-size: 11px;">
     """
     
-    for violation, vcount in top_violations.items():
+    for violation, vcount in top_violations:
         popup_html += f"<li>{violation[:40]}... ({vcount})</li>"
     
-    popup_html += "</ul></div>"
+    popup_html += f"</ul><p style=\"margin: 5px 0; font-size: 11px;\">Most tickets around {busiest_hour:02d}:00</p></div>"
     
     # Add clickable marker
     folium.CircleMarker(
@@ -133,12 +131,12 @@ for cluster_id in significant_clusters.index:
     ).add_to(m)
     
     print(f"  • Cluster #{cluster_id}: {count} violations at ({center_lat:.4f}, {center_lon:.4f})")
-    print(f"    Top violation: {top_violations.index[0]}")
+    print(f"    Top violation: {top_violations[0][0]}")
 
 # Save the heatmap
 m.save("usf_parking_heatmap.html")
 print("\n✅ Heatmap saved: usf_parking_heatmap.html")
-print(f"📍 Total tickets mapped: {len(heat_data)}")
+print(f"📍 Total tickets mapped: {len(df)} in {len(heat_data)} heatmap bins")
 
 folium.Html("usf_parking_current_status.html").add_to(m)
 m.save("usf_combined.html")
@@ -0,0 +1,141 @@
+import bisect
+import os
+import sys
+
+import numpy as np
+
+# StreetStore (street_store.py) lives at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from street_store import load_streets
+
+from address_normalize import HOUSE_NUMBER_PATTERN, normalize_address, normalize_street
+
+DEFAULT_STREETS_PATH = "../data/sf_streets.json"
+# Address range fields of each centerline side (left / right)
+SIDES = (("lf_fadd", "lf_toadd"), ("rt_fadd", "rt_toadd"))
+
+
+def parse_house_number(value):
+    """Integer house number of a range field, or None when empty / not numeric"""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class OfflineGeocoder:
+    """
+    Geocodes "NUMBER STREET" addresses without the network by interpolating
+    along the street centerlines in sf_streets.json.
+
+    Every centerline side with an address range is indexed under its
+    normalized street name, sorted by lowest house number. A lookup finds
+    the range containing the number (preferring the side with the same
+    parity, i.e. the same side of the street) and places the address at the
+    matching fraction of the segment's length.
+    """
+
+    def __init__(self, streets):
+        self.streets = streets
+        names = streets.column("streetname") if "streetname" in streets.properties else None
+        ranges = {}
+        for i in range(len(streets)):
+            name = names[i] if names is not None else None
+            if not name:
+                name = " ".join(p for p in (streets.get("street", i), streets.get("st_type", i)) if p)
+            if not name:
+                continue
+
+            key = normalize_street(name.upper())
+            for from_field, to_field in SIDES:
+                start = parse_house_number(streets.get(from_field, i))
+                end = parse_house_number(streets.get(to_field, i))
+                if start is None or end is None or (start == 0 and end == 0):
+                    continue
+                ranges.setdefault(key, []).append((min(start, end), max(start, end), start, end, i))
+
+        # Per street: ranges sorted by low number, their lows for bisect, and
+        # the widest range, which bounds how far back a lookup has to look
+        self.ranges = {}
+        for key, entries in ranges.items():
+            entries.sort()
+            self.ranges[key] = (
+                [entry[0] for entry in entries],
+                entries,
+                max(high - low for low, high, _, _, _ in entries),
+            )
+        self.lengths = {}
+
+    @classmethod
+    def from_geojson(cls, path=DEFAULT_STREETS_PATH):
+        return cls(load_streets(path))
+
+    def __len__(self):
+        return sum(len(entries) for _, entries, _ in self.ranges.values())
+
+    def find_range(self, key, number):
+        """(start, end, segment) of the address range holding number on the street, or None"""
+        if key not in self.ranges:
+            return None
+
+        lows, entries, widest = self.ranges[key]
+        best = None
+        k = bisect.bisect_right(lows, number) - 1
+        while k >= 0 and lows[k] >= number - widest:
+            low, high, start, end, i = entries[k]
+            if low <= number <= high:
+                if start % 2 == number % 2:
+                    return start, end, i
+                best = best or (start, end, i)
+            k -= 1
+        return best
+
+    def interpolate(self, i, fraction):
+        """(lat, lon) at `fraction` of segment i's length"""
+        coords = self.streets.coordinates(i)
+        if i not in self.lengths:
+            # Degrees of longitude are shorter than degrees of latitude here
+            scale = np.cos(np.radians(coords[:, 1].mean()))
+            steps = np.hypot(np.diff(coords[:, 0]) * scale, np.diff(coords[:, 1]))
+            self.lengths[i] = np.concatenate([[0.0], np.cumsum(steps)])
+
+        cumulative = self.lengths[i]
+        target = fraction * cumulative[-1]
+        k = min(max(int(np.searchsorted(cumulative, target, side="right")) - 1, 0), len(coords) - 2)
+        span = cumulative[k + 1] - cumulative[k]
+        t = (target - cumulative[k]) / span if span > 0 else 0.0
+        lon, lat = coords[k] + t * (coords[k + 1] - coords[k])
+        return float(lat), float(lon)
+
+    def locate(self, address):
+        """(lat, lon) of a "NUMBER STREET" address, or None if it cannot be placed"""
+        address = normalize_address(address)
+        match = HOUSE_NUMBER_PATTERN.match(address) if address else None
+        if match is None:
+            return None
+
+        number = int(match.group(1))
+        found = self.find_range(address[match.end():], number)
+        if found is None:
+            return None
+
+        start, end, i = found
+        fraction = (number - start) / (end - start) if end != start else 0.5
+        return self.interpolate(i, min(max(fraction, 0.0), 1.0))
+
+    def locate_many(self, addresses):
+        """{address: (lat, lon)} for the addresses that could be placed"""
+        located = {}
+        for address in addresses:
+            point = self.locate(address)
+            if point is not None:
+                located[address] = point
+        return located
+
+
+def load_offline_geocoder(path=DEFAULT_STREETS_PATH):
+    """OfflineGeocoder over the street file, or None when it is not available"""
+    if not os.path.exists(path):
+        print(f"⚠️  {path} not found; geocoding online only")
+        return None
+    return OfflineGeocoder.from_geojson(path)
@@ -1,38 +1,169 @@
-import pandas as pd
-from sodapy import Socrata
-from dotenv import load_dotenv
+import argparse
+import json
 import os
+import random
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from dotenv import load_dotenv
+
+from ticket_store import DEFAULT_STORE_DIR, ID_COLUMN, TIME_COLUMN, TicketStore
+from ticket_types import TICKET_SCHEMA, prepare_page
 
 load_dotenv()
 
 APP_TOKEN = os.getenv("DATASF_APP_TOKEN")
 
-# Unauthenticated client only works with public data sets. Note 'None'
-# in place of application token, and no username or password:
-client = Socrata("data.sfgov.org", APP_TOKEN)
+# SF parking citations; point DATASF_BASE_URL at a local fake Socrata server
+# to test the ingest without hitting data.sfgov.org
+BASE_URL = os.getenv("DATASF_BASE_URL", "https://data.sfgov.org")
+DATASET = "ab4h-6ztd"
+PAGE_SIZE = 50000
+# Where the very first run starts; later runs continue from the watermark
+DEFAULT_START = "2025-01-01T00:00:00"
+
+# Pages requested at once, and how hard to retry a failing one
+WORKERS = 4
+RETRIES = 5
+BACKOFF_SECONDS = 1.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# One requests.Session per worker thread
+thread_state = threading.local()
+
+
+def get_session():
+    if not hasattr(thread_state, "session"):
+        thread_state.session = requests.Session()
+        if APP_TOKEN:
+            thread_state.session.headers["X-App-Token"] = APP_TOKEN
+    return thread_state.session
+
+
+def soql_get(params, base_url=BASE_URL, retries=RETRIES):
+    """
+    GET the dataset with SoQL params, retrying timeouts, connection errors
+    and throttling / server errors with jittered exponential backoff.
+    """
+    for attempt in range(retries + 1):
+        try:
+            response = get_session().get(f"{base_url}/resource/{DATASET}.json", params=params, timeout=120)
+            if response.status_code not in RETRY_STATUSES:
+                response.raise_for_status()
+                return response.json()
+            error = f"HTTP {response.status_code}"
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = str(e)
+
+        if attempt == retries:
+            raise RuntimeError(f"Socrata request failed after {retries + 1} attempts: {error}")
+        delay = BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5)
+        print(f"   ⚠️  {error}; retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+
+def count_citations(where, base_url=BASE_URL):
+    """(number of citations matching `where`, latest issue time among them)"""
+    row = soql_get({
+        "$select": f"count(*) AS count, max({TIME_COLUMN}) AS latest",
+        "$where": where,
+    }, base_url)[0]
+    return int(row["count"]), row.get("latest")
+
+
+def fetch_page(where, offset, page_size=PAGE_SIZE, base_url=BASE_URL):
+    """One page of citations matching `where`, in issue-time order"""
+    return soql_get({
+        "$where": where,
+        # Total order, so $offset paging never skips or repeats a row
+        "$order": f"{TIME_COLUMN},{ID_COLUMN}",
+        "$limit": page_size,
+        "$offset": offset,
+    }, base_url)
+
+
+def spool_page(spool_dir, where, offset, page_size=PAGE_SIZE, base_url=BASE_URL):
+    """Fetch a page straight to a JSON file; returns (offset, path, record count)"""
+    records = fetch_page(where, offset, page_size, base_url)
+    path = os.path.join(spool_dir, f"page-{offset:012d}.json")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(records, f)
+    os.replace(f"{path}.tmp", path)
+    return offset, path, len(records)
+
+
+def pull(store, start=DEFAULT_START, page_size=PAGE_SIZE, base_url=BASE_URL, workers=WORKERS):
+    """
+    Append every citation issued at or after the store's watermark (or
+    `start` on the first run) to the store, keeping only the desired
+    violation types and columns (ticket_types.prepare_page).
+
+    The matching rows are counted first and capped at the latest issue time
+    seen then, so the page offsets stay valid while new citations arrive.
+    Up to `workers` pages are fetched at once and spooled to disk as they
+    complete; spooled pages are appended to the store in offset order, so
+    the watermark only ever moves past pages that are fully stored and an
+    interrupted run resumes where it stopped.
+    """
+    since = store.watermark or start
+    total, latest = count_citations(f"{TIME_COLUMN} >= '{since}'", base_url)
+    if total == 0:
+        print(f"✅ No citations issued since {since}")
+        return 0
+
+    where = f"{TIME_COLUMN} >= '{since}' AND {TIME_COLUMN} <= '{latest}'"
+    offsets = list(range(0, total, page_size))
+    print(f"📥 Pulling {total} citations issued since {since} in {len(offsets)} page(s), {workers} at a time")
+
+    spool_dir = os.path.join(store.root, "_spool")
+    shutil.rmtree(spool_dir, ignore_errors=True)
+    os.makedirs(spool_dir)
 
-# Example authenticated client (needed for non-public datasets):
-# client = Socrata(data.sfgov.org,
-#                  MyAppToken,
-#                  username="user@example.com",
-#                  password="AFakePassword")
+    spooled = {}
+    next_offset = 0
+    added = 0
+    pending = set()
+    queued = iter(offsets)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            # Keep a bounded number of pages in flight
+            for offset in queued:
+                pending.add(executor.submit(spool_page, spool_dir, where, offset, page_size, base_url))
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                break
 
-# First 200000 results, returned as JSON from API / converted to Python list of
-# dictionaries by sodapy.
-results = client.get("ab4h-6ztd", where="citation_issued_datetime >= '2025-10-01T00:00:00'", limit=200000)
-result = client.get(
-    "ab4h-6ztd",
-    select="max(citation_issued_datetime)"
-)
-print(result)
-# Convert to pandas DataFrame
-df = pd.DataFrame.from_records(results)
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                offset, path, count = future.result()
+                spooled[offset] = path
 
-df["citation_issued_datetime"] = pd.to_datetime(df["citation_issued_datetime"], errors="coerce")
-df["year"] = df["citation_issued_datetime"].dt.year
+            # Store the contiguous run of finished pages
+            while next_offset in spooled:
+                path = spooled.pop(next_offset)
+                with open(path) as f:
+                    added += store.append(json.load(f), prepare=prepare_page)
+                os.remove(path)
+                print(f"   page at offset {next_offset} stored, {added} kept so far")
+                next_offset += page_size
 
+    shutil.rmtree(spool_dir, ignore_errors=True)
+    print(f"✅ Stored {added} citations; watermark is now {store.watermark}")
+    return added
 
 
-df_2025 = df[df["year"] == 2025]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally pull SF parking citations")
+    parser.add_argument("--store", default=DEFAULT_STORE_DIR)
+    parser.add_argument("--start", default=DEFAULT_START, help="first issue time to pull on an empty store")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--base-url", default=BASE_URL)
+    args = parser.parse_args()
 
-df_2025.to_csv("../data/ticket_data.csv")
+    pull(TicketStore(args.store, schema=TICKET_SCHEMA), start=args.start, page_size=args.page_size,
+         base_url=args.base_url, workers=args.workers)
@@ -2,10 +2,30 @@ import requests
 from dotenv import load_dotenv
 import os
 
+from geocode_cache import GeocodeCache
+from offline_geocoder import load_offline_geocoder
+
 load_dotenv()
 
+GOOGLE_SOURCE = "google"
+
+
+def geocode_google(address, api_key, cache=None, offline=None):
+    """
+    (lat, lon) of an address from the Google Geocoding API, or (None, None).
+    With an OfflineGeocoder, addresses it can place never reach the network;
+    with a GeocodeCache, earlier answers are reused and new ones stored.
+    """
+    if offline is not None:
+        located = offline.locate(address)
+        if located is not None:
+            return located
+
+    if cache is not None:
+        cached = cache.get(address, GOOGLE_SOURCE)
+        if cached is not None:
+            return cached
 
-def geocode_google(address, api_key):
     url = "https://maps.googleapis.com/maps/api/geocode/json"
     params = {
         "address": address,
@@ -19,7 +39,11 @@ def geocode_google(address, api_key):
         
         if data.get("results"):
             location = data["results"][0]["geometry"]["location"]
+            if cache is not None:
+                cache.put(address, location["lat"], location["lng"], GOOGLE_SOURCE)
             return location["lat"], location["lng"]
+        if data.get("status") == "ZERO_RESULTS" and cache is not None:
+            cache.put(address, None, None, GOOGLE_SOURCE)
     except requests.exceptions.RequestException as e:
         print(f"Error: {e}")
     
@@ -28,5 +52,5 @@ def geocode_google(address, api_key):
 
 # Get an API key from Google Cloud Console
 GOOGLE_API_KEY = os.getenv("GOOGLE_MAPS_API")
-lat, lon = geocode_google("921 CENTRAL AVE San Francisco CA", GOOGLE_API_KEY)
-print(lat, lon)
\ No newline at end of file
+lat, lon = geocode_google("921 CENTRAL AVE San Francisco CA", GOOGLE_API_KEY, cache=GeocodeCache(), offline=load_offline_geocoder())
+print(lat, lon)
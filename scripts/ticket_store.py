@@ -0,0 +1,118 @@
+import json
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+DEFAULT_STORE_DIR = "../data/tickets"
+TIME_COLUMN = "citation_issued_datetime"
+# Citations issued in the same second are told apart by their number
+ID_COLUMN = "citation_number"
+
+
+class TicketStore:
+    """
+    Citations stored as Parquet month partitions
+    (<root>/month=YYYY-MM/part-NNNNN.parquet, typed with `schema` when
+    given) plus a manifest (<root>/manifest.json) holding the ingest high-water
+    mark on citation_issued_datetime.
+
+    Only parts listed in the manifest are read, and the manifest is rewritten
+    after the part is on disk, so an interrupted append leaves at most an
+    orphan file and never a half-recorded page.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, schema=None):
+        self.root = root
+        self.schema = schema
+        self.manifest_path = os.path.join(root, "manifest.json")
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"watermark": None, "watermark_ids": [], "parts": []}
+
+    @property
+    def watermark(self):
+        """Latest citation_issued_datetime stored (Socrata ISO string), or None"""
+        return self.manifest["watermark"]
+
+    def is_new(self, records):
+        """
+        Mask of the records not stored yet: issued after the watermark, or
+        in the watermark second itself (pages are requested from the
+        watermark inclusive) without an id already stored for it.
+        """
+        if self.watermark is None:
+            return [True] * len(records)
+
+        seen = set(self.manifest["watermark_ids"])
+        return [
+            (record.get(TIME_COLUMN) or "") > self.watermark
+            or (record.get(TIME_COLUMN) == self.watermark and record.get(ID_COLUMN) not in seen)
+            for record in records
+        ]
+
+    def append(self, records, prepare=None):
+        """
+        Store a page of Socrata records; returns the number of new ones.
+        `prepare` (DataFrame -> DataFrame) filters / projects the new
+        records before they are written; the watermark still covers every
+        record seen, so filtered-out ones are not fetched again.
+        """
+        records = [record for record, new in zip(records, self.is_new(records)) if new]
+        if not records:
+            return 0
+
+        df = pd.DataFrame.from_records(records)
+        # Socrata floating timestamps share one ISO format, so they sort as strings
+        watermark = df[TIME_COLUMN].dropna().max()
+        watermark_ids = df.loc[df[TIME_COLUMN] == watermark, ID_COLUMN] if ID_COLUMN in df else []
+
+        kept = df if prepare is None else prepare(df)
+        issued = pd.to_datetime(kept[TIME_COLUMN], errors="coerce")
+        months = issued.dt.strftime("%Y-%m").fillna("unknown")
+        for month, part in kept.groupby(months, sort=True):
+            self.write_part(month, part)
+
+        if isinstance(watermark, str) and (self.watermark is None or watermark >= self.watermark):
+            ids = list(watermark_ids)
+            if watermark == self.watermark:
+                ids = list(self.manifest["watermark_ids"]) + ids
+            self.manifest["watermark"] = watermark
+            self.manifest["watermark_ids"] = [str(i) for i in ids]
+        self.save_manifest()
+        return len(kept)
+
+    def write_part(self, month, df):
+        month_dir = os.path.join(self.root, f"month={month}")
+        os.makedirs(month_dir, exist_ok=True)
+        name = f"month={month}/part-{len(self.manifest['parts']):05d}.parquet"
+        path = os.path.join(self.root, name)
+
+        df.to_parquet(f"{path}.tmp", index=False, schema=self.schema)
+        os.replace(f"{path}.tmp", path)
+        self.manifest["parts"].append(name)
+
+    def save_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(f"{self.manifest_path}.tmp", "w") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(f"{self.manifest_path}.tmp", self.manifest_path)
+
+    def iter_parts(self, columns=None):
+        """Stored citations one part at a time (optionally only `columns`)"""
+        for name in self.manifest["parts"]:
+            path = os.path.join(self.root, name)
+            if columns is None:
+                yield pd.read_parquet(path)
+                continue
+
+            # Untyped parts keep Socrata's shape, which leaves out empty fields
+            present = [c for c in columns if c in pq.read_schema(path).names]
+            yield pd.read_parquet(path, columns=present).reindex(columns=columns)
+
+    def read(self, columns=None):
+        """All stored citations as one DataFrame (optionally only `columns`)"""
+        frames = list(self.iter_parts(columns))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
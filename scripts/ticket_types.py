@@ -0,0 +1,31 @@
+import pandas as pd
+import pyarrow as pa
+
+# Violation types the maps cover
+DESIRED_TYPES = ["STR CLEAN", "PRK PROHIB", "PKG PROHIB", "NO PRK ZN", "DISOB SIGN", "NO PERMIT", "TMP PK RES", "METER DTN", "MTR OUT DT", "FIRE HYD", "RED ZONE", "YEL ZONE", "WHITE ZONE", "GREEN ZONE", "BLK BIKE L", "BL ZNE BLK", "SAFE/RED Z"]
+
+# Citation fields used downstream (geocoding, merging, maps)
+KEEP_COLUMNS = ["citation_number", "citation_issued_datetime", "violation", "violation_desc",
+                "citation_location", "fine_amount"]
+
+# Parquet types for KEEP_COLUMNS: every part and export shares this schema, so
+# readers get parsed datetimes, floats and a dictionary-encoded violation type
+TICKET_SCHEMA = pa.schema([
+    ("citation_number", pa.string()),
+    ("citation_issued_datetime", pa.timestamp("ms")),
+    ("violation", pa.string()),
+    ("violation_desc", pa.dictionary(pa.int8(), pa.string())),
+    ("citation_location", pa.string()),
+    ("fine_amount", pa.float64()),
+])
+
+
+def prepare_page(df):
+    """Keep the desired violation types and columns of a page, typed as in TICKET_SCHEMA"""
+    df = df.reindex(columns=KEEP_COLUMNS)
+    df = df[df["violation_desc"].isin(DESIRED_TYPES)]
+    return df.assign(
+        citation_issued_datetime=pd.to_datetime(df["citation_issued_datetime"], errors="coerce"),
+        violation_desc=pd.Categorical(df["violation_desc"], categories=DESIRED_TYPES),
+        fine_amount=pd.to_numeric(df["fine_amount"], errors="coerce"),
+    )
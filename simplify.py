@@ -0,0 +1,72 @@
+import numpy as np
+
+TILE_SIZE = 256
+
+
+def tolerance_for_zoom(zoom, pixels=0.5):
+    """Width of `pixels` screen pixels in degrees of longitude at a zoom level"""
+    return pixels * 360.0 / (TILE_SIZE * 2 ** zoom)
+
+
+def simplify_line(coords, tolerance):
+    """
+    Douglas-Peucker simplification of an (n, 2) vertex array.
+    Endpoints are always kept; interior vertices closer than `tolerance` to
+    the simplified line are dropped.
+    """
+    return coords[simplify_mask(coords, tolerance)]
+
+
+def simplify_mask(coords, tolerance):
+    """Boolean mask of the vertices simplify_line() keeps"""
+    n = len(coords)
+    if n < 3 or tolerance <= 0:
+        return np.ones(n, dtype=bool)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        a = coords[start]
+        b = coords[end]
+        pts = coords[start + 1:end]
+        d = b - a
+        length = np.hypot(d[0], d[1])
+        if length == 0:
+            dist = np.hypot(pts[:, 0] - a[0], pts[:, 1] - a[1])
+        else:
+            dist = np.abs(d[0] * (pts[:, 1] - a[1]) - d[1] * (pts[:, 0] - a[0])) / length
+
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            split = start + 1 + k
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return keep
+
+
+# Zoom levels that get a precomputed simplification; finer zooms use the
+# full geometry
+LEVEL_ZOOMS = (10, 12, 14, 16)
+
+
+def build_levels(coords, offsets, zooms=LEVEL_ZOOMS):
+    """
+    Vertex keep-masks, one per zoom level, marking the vertices that survive
+    simplifying every segment to that zoom's tolerance.
+    """
+    levels = {}
+    for zoom in zooms:
+        tolerance = tolerance_for_zoom(zoom)
+        keep = np.zeros(len(coords), dtype=bool)
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            keep[start:end] = simplify_mask(coords[start:end], tolerance)
+        levels[zoom] = keep
+    return levels
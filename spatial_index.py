@@ -0,0 +1,78 @@
+import numpy as np
+
+
+class GridIndex:
+    """
+    Uniform grid over a set of points (e.g. street segment centroids).
+
+    Points are bucketed into cells once when the index is built, so a bbox
+    query only has to look at the cells the bbox overlaps instead of
+    scanning every point.
+    """
+
+    def __init__(self, lons, lats, cell_size=0.005):
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.cell_size = cell_size
+
+        if len(self.lons) == 0:
+            self.lon0, self.lat0 = 0.0, 0.0
+            self.ncols, self.nrows = 1, 1
+            self.order = np.empty(0, dtype=np.int64)
+            self.cell_starts = np.zeros(2, dtype=np.int64)
+            return
+
+        self.lon0 = float(self.lons.min())
+        self.lat0 = float(self.lats.min())
+
+        cols = ((self.lons - self.lon0) / cell_size).astype(np.int64)
+        rows = ((self.lats - self.lat0) / cell_size).astype(np.int64)
+        self.ncols = int(cols.max()) + 1
+        self.nrows = int(rows.max()) + 1
+
+        # Sort points by cell id; every cell (and every run of cells within
+        # one grid row) is then a contiguous slice of self.order
+        cell_ids = rows * self.ncols + cols
+        self.order = np.argsort(cell_ids, kind="stable")
+        self.cell_starts = np.searchsorted(
+            cell_ids[self.order], np.arange(self.nrows * self.ncols + 1)
+        )
+
+    def __len__(self):
+        return len(self.lons)
+
+    def cell(self, value, origin, count):
+        """Grid column/row of a coordinate, clamped to [-1, count] before int conversion"""
+        return int(np.clip(np.floor((value - origin) / self.cell_size), -1, count))
+
+    def query(self, min_lon, min_lat, max_lon, max_lat):
+        """Return the sorted indices of all points inside the bbox (inclusive)"""
+        if np.isnan([min_lon, min_lat, max_lon, max_lat]).any():
+            return np.empty(0, dtype=np.int64)
+
+        col_lo = max(self.cell(min_lon, self.lon0, self.ncols), 0)
+        col_hi = min(self.cell(max_lon, self.lon0, self.ncols), self.ncols - 1)
+        row_lo = max(self.cell(min_lat, self.lat0, self.nrows), 0)
+        row_hi = min(self.cell(max_lat, self.lat0, self.nrows), self.nrows - 1)
+
+        if col_lo > col_hi or row_lo > row_hi:
+            return np.empty(0, dtype=np.int64)
+
+        chunks = []
+        for row in range(row_lo, row_hi + 1):
+            start = self.cell_starts[row * self.ncols + col_lo]
+            end = self.cell_starts[row * self.ncols + col_hi + 1]
+            if end > start:
+                chunks.append(self.order[start:end])
+
+        if not chunks:
+            return np.empty(0, dtype=np.int64)
+
+        candidates = np.concatenate(chunks)
+        lons = self.lons[candidates]
+        lats = self.lats[candidates]
+        inside = (
+            (lons >= min_lon) & (lons <= max_lon) &
+            (lats >= min_lat) & (lats <= max_lat)
+        )
+        return np.sort(candidates[inside])
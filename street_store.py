@@ -0,0 +1,264 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+from simplify import build_levels, tolerance_for_zoom
+
+# Bump whenever the on-disk cache layout changes so stale caches are rebuilt
+CACHE_VERSION = 3
+
+
+class StreetStore:
+    """
+    Columnar, read-only store of street centerline segments.
+
+    All vertices live in one flat (n_vertices, 2) lon/lat array; segment i
+    owns coords[offsets[i]:offsets[i + 1]]. Properties are kept per column as
+    an integer code array plus a list of the distinct (interned) values, so
+    repeated strings like street names are only stored once.
+
+    Simplified geometry is precomputed for a few zoom levels as vertex
+    keep-masks over the same coords array (see simplify.build_levels).
+    """
+
+    def __init__(self, coords, offsets, properties, centroids=None, bboxes=None, levels=None):
+        self.coords = coords
+        self.offsets = offsets
+        self.properties = properties
+        self.levels = levels if levels is not None else build_levels(coords, offsets)
+
+        if centroids is not None and bboxes is not None:
+            self.centroids = centroids
+            self.bboxes = bboxes
+            return
+
+        starts = offsets[:-1]
+        counts = np.diff(offsets)
+        if len(counts):
+            self.centroids = np.add.reduceat(coords, starts, axis=0) / counts[:, None]
+            mins = np.minimum.reduceat(coords, starts, axis=0)
+            maxs = np.maximum.reduceat(coords, starts, axis=0)
+            # (minlon, minlat, maxlon, maxlat) per segment
+            self.bboxes = np.hstack([mins, maxs])
+        else:
+            self.centroids = np.empty((0, 2))
+            self.bboxes = np.empty((0, 4))
+
+    @classmethod
+    def from_geojson(cls, path):
+        """Convert a GeoJSON FeatureCollection of LineStrings into a store"""
+        with open(path, "r") as f:
+            features = json.load(f)["features"]
+
+        coord_chunks = []
+        offsets = [0]
+        columns = {}
+        interned = {}
+        kept = 0
+
+        for feature in features:
+            geometry = feature.get("geometry") or {}
+            coords = geometry.get("coordinates") or []
+            if geometry.get("type") != "LineString" or not coords:
+                continue
+
+            coord_chunks.append(np.asarray(coords, dtype=np.float64)[:, :2])
+            offsets.append(offsets[-1] + len(coords))
+
+            for name, value in (feature.get("properties") or {}).items():
+                if name not in columns:
+                    # Backfill earlier segments that did not have this property
+                    columns[name] = [0] * kept
+                    interned[name] = {None: 0}
+                codes = interned[name]
+                key = value if not isinstance(value, (list, dict)) else json.dumps(value)
+                if key not in codes:
+                    codes[key] = len(codes)
+                columns[name].append(codes[key])
+
+            kept += 1
+            for name, codes in columns.items():
+                if len(codes) < kept:
+                    codes.append(0)
+
+        coords = np.concatenate(coord_chunks) if coord_chunks else np.empty((0, 2))
+        properties = {
+            name: (np.asarray(codes, dtype=np.int32), list(interned[name]))
+            for name, codes in columns.items()
+        }
+        return cls(coords, np.asarray(offsets, dtype=np.int64), properties)
+
+    def save(self, cache_dir, source=None):
+        """
+        Write the store as a new build directory of .npy files inside
+        cache_dir, then publish it by replacing cache_dir/meta.json.
+        Files of earlier builds are never rewritten, so workers that have
+        them memory-mapped keep reading consistent arrays; an interrupted
+        save is never loaded.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        # Earlier builds, and the flat .npy files of the version 2 layout
+        stale = [name for name in os.listdir(cache_dir) if name.startswith("build-") or name.endswith(".npy")]
+        build_dir = tempfile.mkdtemp(prefix="build-", dir=cache_dir)
+        names = list(self.properties)
+
+        arrays = {
+            "coords": self.coords,
+            "offsets": self.offsets,
+            "centroids": self.centroids,
+            "bboxes": self.bboxes,
+        }
+        for k, name in enumerate(names):
+            arrays[f"prop_{k}"] = self.properties[name][0]
+        for zoom, keep in self.levels.items():
+            arrays[f"level_{zoom}"] = keep
+        for name, array in arrays.items():
+            np.save(os.path.join(build_dir, f"{name}.npy"), np.ascontiguousarray(array))
+
+        meta = {
+            "version": CACHE_VERSION,
+            "source": source,
+            "build": os.path.basename(build_dir),
+            "columns": [[name, self.properties[name][1]] for name in names],
+            "levels": list(self.levels),
+        }
+        fd, tmp_path = tempfile.mkstemp(prefix="meta-", suffix=".tmp", dir=cache_dir)
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(cache_dir, "meta.json"))
+
+        # Unlinking is safe for mapped files: their pages stay valid until
+        # the last worker using them unmaps
+        for name in stale:
+            path = os.path.join(cache_dir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+    @classmethod
+    def load(cls, cache_dir, source=None):
+        """
+        Memory-map a store written by save(). Returns None if the cache is
+        missing, from another CACHE_VERSION, or was built from a different
+        source file.
+        """
+        try:
+            with open(os.path.join(cache_dir, "meta.json"), "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if meta.get("version") != CACHE_VERSION:
+            return None
+        if source is not None and meta.get("source") != source:
+            return None
+
+        if not meta.get("build"):
+            return None
+        build_dir = os.path.join(cache_dir, meta["build"])
+
+        def load_array(name):
+            return np.load(os.path.join(build_dir, f"{name}.npy"), mmap_mode="r")
+
+        try:
+            properties = {
+                name: (load_array(f"prop_{k}"), values)
+                for k, (name, values) in enumerate(meta["columns"])
+            }
+            return cls(
+                load_array("coords"),
+                load_array("offsets"),
+                properties,
+                centroids=load_array("centroids"),
+                bboxes=load_array("bboxes"),
+                levels={zoom: load_array(f"level_{zoom}") for zoom in meta["levels"]},
+            )
+        except (OSError, ValueError):
+            return None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def level_for(self, tolerance):
+        """
+        Coarsest precomputed zoom level whose simplification tolerance does
+        not exceed `tolerance`, or None when only full geometry qualifies.
+        """
+        for zoom in sorted(self.levels):
+            if tolerance_for_zoom(zoom) <= tolerance:
+                return zoom
+        return None
+
+    def coordinates(self, i, level=None):
+        """Vertex array (n, 2) of segment i, simplified to a zoom level if given"""
+        start, end = self.offsets[i], self.offsets[i + 1]
+        if level is None:
+            return self.coords[start:end]
+        return self.coords[start:end][self.levels[level][start:end]]
+
+    def geometry(self, i, level=None):
+        """GeoJSON geometry of segment i"""
+        return {"type": "LineString", "coordinates": self.coordinates(i, level).tolist()}
+
+    def column(self, name):
+        """Decoded values of one property for every segment"""
+        codes, values = self.properties[name]
+        return np.asarray(values, dtype=object)[codes]
+
+    def get(self, name, i, default=None):
+        """Value of one property for segment i"""
+        if name not in self.properties:
+            return default
+        codes, values = self.properties[name]
+        value = values[codes[i]]
+        return default if value is None else value
+
+
+def source_key(path):
+    """Identify a source file version by its size and modification time"""
+    stat = os.stat(path)
+    return {"path": os.path.basename(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def default_cache_dir(path):
+    return os.path.splitext(path)[0] + ".cache"
+
+
+def build_cache(path, cache_dir=None):
+    """Parse the GeoJSON source and write its binary cache"""
+    store = StreetStore.from_geojson(path)
+    store.save(cache_dir or default_cache_dir(path), source=source_key(path))
+    return store
+
+
+def load_streets(path, cache_dir=None):
+    """
+    Load street centerlines, memory-mapping the binary cache when it is up to
+    date with the source file and (re)building it otherwise. Worker processes
+    that map the same cache share its pages.
+    """
+    cache_dir = cache_dir or default_cache_dir(path)
+    store = StreetStore.load(cache_dir, source=source_key(path))
+    if store is not None:
+        return store
+
+    print(f"Building street cache for {path}...")
+    store = StreetStore.from_geojson(path)
+    try:
+        store.save(cache_dir, source=source_key(path))
+    except OSError as e:
+        # A read-only deploy can still serve from the parsed source
+        print(f"Could not write street cache: {e}")
+    return store
+
+
+if __name__ == "__main__":
+    # Build step: python street_store.py [data/sf_streets.json]
+    source_path = sys.argv[1] if len(sys.argv) > 1 else "data/sf_streets.json"
+    store = build_cache(source_path)
+    print(f"Cached {len(store)} segments to {default_cache_dir(source_path)}")
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+from sklearn.cluster import DBSCAN
+
+from hotspots import SF_ORIGIN, HotspotState, project_to_meters
+
+
+def citations(n, seed, start=0):
+    """n synthetic citations around a few San Francisco hotspots"""
+    rng = np.random.default_rng(seed)
+    centers = np.array([[37.7763, -122.4505], [37.7793, -122.4193], [37.7599, -122.4148]])
+    points = centers[rng.integers(0, len(centers), n)] + rng.normal(0, 0.0004, (n, 2))
+    return pd.DataFrame({
+        "citation_number": np.arange(start, start + n).astype(str),
+        "latitude": points[:, 0],
+        "longitude": points[:, 1],
+    })
+
+
+def assert_same_clusters(labels, expected):
+    """Same noise cells and a one-to-one mapping between cluster ids"""
+    assert ((labels >= 0) == (expected >= 0)).all()
+    pairs = pd.DataFrame({"a": labels, "b": expected})[expected >= 0].drop_duplicates()
+    assert pairs["a"].is_unique and pairs["b"].is_unique
+
+
+def rebuilt(state):
+    full = HotspotState(state.eps_meters, state.min_samples, grid_threshold=0)
+    full.keys, full.counts = state.keys, state.counts
+    full.recluster()
+    return full.labels
+
+
+def test_small_append_matches_full_recluster():
+    df = citations(5000, seed=0)
+    state = HotspotState(grid_threshold=0)
+    state.update(df)
+
+    # A single ticket on a quiet street, then a small batch near the hotspots
+    quiet = pd.DataFrame({"citation_number": ["quiet"], "latitude": [37.7100], "longitude": [-122.5000]})
+    df = pd.concat([df, quiet])
+    assert state.update(df) == (1, 0)
+    assert_same_clusters(state.labels, rebuilt(state))
+
+    df = pd.concat([df, citations(200, seed=1, start=5000)])
+    assert state.update(df) == (200, 0)
+    assert_same_clusters(state.labels, rebuilt(state))
+
+
+def test_dropped_and_moved_citations_match_full_recluster():
+    df = citations(5000, seed=2)
+    state = HotspotState(grid_threshold=0)
+    state.update(df)
+
+    df = df.drop(df.index[:150])
+    moved = df.index[:50]
+    df.loc[moved, "latitude"] += 0.001
+    assert state.update(df) == (50, 200)
+    assert_same_clusters(state.labels, rebuilt(state))
+
+
+def test_small_states_cluster_points_exactly():
+    df = citations(3000, seed=4)
+    state = HotspotState()
+    state.update(df)
+    assert state.by_points
+
+    xy = project_to_meters(df["latitude"].values, df["longitude"].values, origin=SF_ORIGIN)
+    expected = DBSCAN(eps=state.eps_meters, min_samples=state.min_samples).fit(xy).labels_
+    assert_same_clusters(state.labels_for(df["latitude"].values, df["longitude"].values), expected)
+
+
+def test_outgrowing_the_threshold_switches_to_cells():
+    df = citations(3000, seed=5)
+    state = HotspotState(grid_threshold=3000)
+    state.update(df)
+    assert state.by_points
+
+    df = pd.concat([df, citations(10, seed=6, start=3000)])
+    state.update(df)
+    assert not state.by_points
+    assert_same_clusters(state.labels, rebuilt(state))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    state = HotspotState()
+    state.update(citations(2000, seed=3))
+    path = str(tmp_path / "hotspot_state.npz")
+    state.save(path)
+
+    loaded = HotspotState.load(path)
+    assert (loaded.keys == state.keys).all()
+    assert (loaded.labels == state.labels).all()
+    assert (loaded.citation_labels == state.citation_labels).all()
+    assert loaded.update(citations(2000, seed=3)) == (0, 0)
+
+
+def test_unreadable_state_loads_empty(tmp_path):
+    path = tmp_path / "hotspot_state.npz"
+    path.write_bytes(b"PK\x03\x04truncated")
+    assert len(HotspotState.load(str(path)).keys) == 0
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from spatial_index import GridIndex
+
+TICKET_COLUMNS = ["citation_issued_datetime", "violation_desc", "latitude", "longitude"]
+
+
+class TicketIndex:
+    """
+    Geocoded citations loaded once and indexed for bbox / time / violation
+    queries.
+
+    Rows are sorted by issue time, so a time range is a contiguous slice of
+    row numbers; a GridIndex over the coordinates narrows a bbox down to a
+    few cells. Violation types are stored as integer codes.
+    """
+
+    def __init__(self, lats, lons, times, violation_codes, violation_names):
+        self.lats = lats
+        self.lons = lons
+        self.times = times
+        self.violation_codes = violation_codes
+        self.violation_names = violation_names
+        self.grid = GridIndex(lons, lats, cell_size=0.002)
+
+    @classmethod
+    def from_frame(cls, df):
+        df = df[(df["latitude"].notna()) & (df["longitude"].notna())]
+        df = df[(df["latitude"] != 0) & (df["longitude"] != 0)]
+        df = df.assign(
+            citation_issued_datetime=pd.to_datetime(df["citation_issued_datetime"], errors="coerce")
+        )
+        df = df[df["citation_issued_datetime"].notna()]
+        df = df.sort_values("citation_issued_datetime", kind="stable")
+
+        violations = df["violation_desc"].astype(object).fillna("").astype("category")
+        return cls(
+            df["latitude"].to_numpy(dtype=np.float64),
+            df["longitude"].to_numpy(dtype=np.float64),
+            df["citation_issued_datetime"].to_numpy(dtype="datetime64[s]"),
+            violations.cat.codes.to_numpy(dtype=np.int32),
+            list(violations.cat.categories),
+        )
+
+    @classmethod
+    def from_parquet(cls, path):
+        return cls.from_frame(pd.read_parquet(path, columns=TICKET_COLUMNS))
+
+    def __len__(self):
+        return len(self.lats)
+
+    def query(self, bbox=None, start=None, end=None, violations=None):
+        """
+        Row numbers (in time order) of the citations inside bbox, issued in
+        [start, end), whose violation_desc is one of `violations`. Any filter
+        left as None is not applied.
+        """
+        lo = 0 if start is None else np.searchsorted(self.times, np.datetime64(start, "s"), side="left")
+        hi = len(self) if end is None else np.searchsorted(self.times, np.datetime64(end, "s"), side="left")
+
+        if bbox is None:
+            rows = np.arange(lo, hi)
+        else:
+            rows = self.grid.query(*bbox)
+            rows = rows[np.searchsorted(rows, lo):np.searchsorted(rows, hi)]
+
+        if violations is not None:
+            wanted = [k for k, name in enumerate(self.violation_names) if name in set(violations)]
+            rows = rows[np.isin(self.violation_codes[rows], wanted)]
+
+        return rows
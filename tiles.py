@@ -0,0 +1,77 @@
+import gzip
+import hashlib
+import math
+import os
+import tempfile
+
+from response_cache import CachedPayload
+
+MAX_ZOOM = 22
+
+
+def tile_bounds(z, x, y):
+    """(minlon, minlat, maxlon, maxlat) of a Web Mercator (slippy map) tile"""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def coordinate_decimals(tolerance):
+    """Enough decimal places to keep rounding error below the tolerance"""
+    return min(max(int(math.ceil(-math.log10(tolerance))) + 1, 1), 7)
+
+
+class CachedTile:
+    """A gzipped tile read from disk; the plain body is decompressed on demand"""
+
+    def __init__(self, gzipped):
+        self.gzipped = gzipped
+
+    @property
+    def body(self):
+        return gzip.decompress(self.gzipped)
+
+
+class TileCache:
+    """
+    On-disk cache of gzipped tiles under cache_dir/<version>/z/x/y.json.gz.
+    A new data version gets a fresh directory, so stale tiles are never
+    served. Same get(key, build) interface as ResponseCache.
+    """
+
+    def __init__(self, cache_dir, version):
+        digest = hashlib.sha1(str(version).encode()).hexdigest()[:16]
+        self.root = os.path.join(cache_dir, digest)
+
+    def path(self, z, x, y):
+        return os.path.join(self.root, str(z), str(x), f"{y}.json.gz")
+
+    def get(self, key, build):
+        z, x, y = key
+        path = self.path(z, x, y)
+        try:
+            with open(path, "rb") as f:
+                return CachedTile(f.read())
+        except FileNotFoundError:
+            pass
+
+        entry = CachedPayload(build())
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Unique per writer: concurrent misses on a tile (threads or
+            # processes) each write their own file and the last replace wins
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(entry.gzipped)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write tile {z}/{x}/{y}: {e}")
+        return entry